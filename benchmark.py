@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Replay test corpora against Discovery and/or NLProcessor to measure capacity.
+
+Closed loop keeps a fixed number of requests in flight;
+open loop sends requests at a target rate whether or not earlier ones have returned.
+Correctness is not checked here, only throughput, latency and errors.
+Every request goes to the service, bypassing the response caches test_nlp.py uses,
+so repeated runs against replay_server.py measure the server every time.
+
+python benchmark.py examples/digit_tests.txt --mode closed --concurrency 8
+python benchmark.py examples/*_tests.txt --mode open --qps 50 --duration 60
+
+Test files are positional, so a glob may be expanded by the shell or quoted and expanded here;
+every other option must be given by name.
+"""
+
+import asyncio
+import bisect
+import itertools
+import time
+from collections import defaultdict
+
+from fire import Fire
+
+from conftest import iter_test_cases
+from testing.async_interface import AsyncClient
+from testing.latency import summarize
+from testing.metrics import divide_or_zero, percentile, std_float
+from testing.output_tests import TABLE_BAR_LENGTH, json_dump
+
+SERVICES = ("discovery", "nlprocessor", "stack")
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+def load_requests(tests, service):
+    """
+    Turn every test case into the arguments its service call needs
+    """
+    tests = [tests] if isinstance(tests, str) else list(tests)
+    requests = []
+    for case in iter_test_cases(tests):
+        if service == "discovery" and not case.intents:
+            continue
+        if service == "nlprocessor" and not case.nlp_models:
+            continue
+        requests.append(
+            (
+                case.test_dict["transcript"],
+                case.intents,
+                case.nlp_models,
+                case.test_dict.get("external_json", {}),
+            )
+        )
+    assert requests, f"No test cases in {tests} exercise {service}"
+    return requests
+
+
+def histogram(times_ms):
+    """
+    Count latencies into buckets labelled by their upper bound in milliseconds
+
+    >>> histogram([12000, 3, 0.5, 3, 5])
+    {'<=1': 1, '<=5': 3, '>10000': 1}
+    """
+    labels = [f"<={bound}" for bound in HISTOGRAM_BOUNDS_MS]
+    labels.append(f">{HISTOGRAM_BOUNDS_MS[-1]}")
+    counts = [0] * len(labels)
+    for time_ms in times_ms:
+        counts[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, time_ms)] += 1
+    return {label: count for label, count in zip(labels, counts) if count}
+
+
+class BenchmarkResults:
+    """
+    Every completed request as (completion offset in seconds, latency in ms, success)
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.samples = []
+
+    def record(self, started, ok):
+        finished = time.perf_counter()
+        self.samples.append(
+            (finished - self.start, (finished - started) * 1000, bool(ok))
+        )
+
+    def timeseries(self, interval):
+        """
+        Throughput, errors and latency per interval of the run
+        """
+        buckets = defaultdict(list)
+        for offset, time_ms, ok in self.samples:
+            buckets[int(offset // interval)].append((time_ms, ok))
+        return [
+            {
+                "second": std_float(index * interval),
+                "throughput": std_float(len(samples) / interval),
+                "errors": sum(not ok for _, ok in samples),
+                "p50": std_float(percentile([t for t, _ in samples], 50)),
+                "p99": std_float(percentile([t for t, _ in samples], 99)),
+            }
+            for index, samples in sorted(buckets.items())
+        ]
+
+    def summary(self, interval=1.0):
+        elapsed = max((offset for offset, _, _ in self.samples), default=0)
+        times_ms = [time_ms for _, time_ms, _ in self.samples]
+        errors = sum(not ok for _, _, ok in self.samples)
+        return {
+            "requests": len(self.samples),
+            "errors": errors,
+            "error_rate": std_float(divide_or_zero(errors, len(self.samples))),
+            "elapsed_sec": std_float(elapsed),
+            "throughput": std_float(divide_or_zero(len(self.samples), elapsed)),
+            "latency_ms": summarize(times_ms),
+            "histogram_ms": histogram(times_ms),
+            "timeseries": self.timeseries(interval),
+        }
+
+
+async def send(client, service, request, results, started=None):
+    """
+    Make one request; open loop passes the scheduled start so queueing counts as latency
+    """
+    transcript, intents, nlp_models, external_json = request
+    started = started or time.perf_counter()
+    try:
+        resp = {}
+        if service in ("nlprocessor", "stack") and nlp_models:
+            resp = await client.submit_nlprocessor_transcript(
+                transcript, nlp_models, external_json
+            )
+            external_json = {**external_json, **resp}
+        if service in ("discovery", "stack") and intents:
+            resp = await client.submit_discovery_transcript(
+                transcript, intents, external_json
+            )
+        ok = resp and resp.get("result") != "failure"
+    except Exception:
+        ok = False
+    results.record(started, ok)
+
+
+async def closed_loop(client, service, requests, results, concurrency, duration):
+    """
+    Each of `concurrency` workers sends its next request as soon as the last returns
+    """
+    deadline = time.perf_counter() + duration
+    requests = itertools.cycle(requests)
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            await send(client, service, next(requests), results)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def open_loop(client, service, requests, results, qps, duration):
+    """
+    Send requests on a fixed schedule of qps per second regardless of completions
+    """
+    start = time.perf_counter()
+    tasks = []
+    for index, request in enumerate(itertools.cycle(requests)):
+        scheduled = start + index / qps
+        if scheduled - start >= duration:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(
+            asyncio.ensure_future(send(client, service, request, results, scheduled))
+        )
+    await asyncio.gather(*tasks)
+
+
+def print_summary(service, mode, summary):
+    print(TABLE_BAR_LENGTH * "-")
+    print(f"\n{service} benchmark ({mode} loop)\n")
+    print(
+        "{} requests in {} seconds: {} requests/second, {} errors ({:.2%})".format(
+            summary["requests"],
+            summary["elapsed_sec"],
+            summary["throughput"],
+            summary["errors"],
+            summary["error_rate"],
+        )
+    )
+    print(
+        "latency (ms): "
+        + ", ".join(f"{k} {v}" for k, v in summary["latency_ms"].items())
+    )
+    print("\nhistogram (ms):")
+    for label, count in summary["histogram_ms"].items():
+        print("{:>10s} {:>8d}".format(label, count))
+    print(
+        "\n{:>10s}{:>14s}{:>8s}{:>10s}{:>10s}".format(
+            "second", "requests/s", "errors", "p50", "p99"
+        )
+    )
+    for sample in summary["timeseries"]:
+        print(
+            "{:>10.2f}{:>14.2f}{:>8d}{:>10.2f}{:>10.2f}".format(
+                sample["second"],
+                sample["throughput"],
+                sample["errors"],
+                sample["p50"],
+                sample["p99"],
+            )
+        )
+    print(TABLE_BAR_LENGTH * "-")
+
+
+def run(
+    *tests,
+    service="discovery",
+    mode="closed",
+    concurrency=8,
+    qps=10.0,
+    duration=30.0,
+    interval=1.0,
+    output=None,
+):
+    """
+    Benchmark a running service with the transcripts from test files.
+
+    :param tests: test files, as accepted by pytest's --tests option; wildcards are expanded
+    :param service: discovery, nlprocessor, or stack to send nlprocessor output on to discovery
+    :param mode: closed for fixed concurrency, open for a fixed request rate
+    :param concurrency: requests in flight in closed loop; connection limit in open loop
+    :param qps: requests per second in open loop
+    :param duration: seconds to keep sending requests
+    :param interval: seconds per time-series sample
+    :param output: optional json file to save the results to
+    """
+    assert tests, "Give at least one test file"
+    assert service in SERVICES, f"service must be one of {SERVICES}"
+    assert mode in ("closed", "open"), "mode must be closed or open"
+    requests = load_requests(tests, service)
+
+    async def benchmark():
+        results = BenchmarkResults()
+        async with AsyncClient(concurrency=concurrency) as client:
+            if mode == "closed":
+                await closed_loop(
+                    client, service, requests, results, concurrency, duration
+                )
+            else:
+                await open_loop(client, service, requests, results, qps, duration)
+        return results
+
+    summary = asyncio.run(benchmark()).summary(interval)
+    summary.update(service=service, mode=mode, concurrency=concurrency, qps=qps)
+    print_summary(service, mode, summary)
+    if output:
+        json_dump(summary, output)
+
+
+if __name__ == "__main__":
+    Fire(run)
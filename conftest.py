@@ -4,6 +4,7 @@ Set arguments for pytest invocations and load fixtures into test_discovery.py
 """
 import glob
 import logging
+from collections import namedtuple
 from os.path import dirname
 from os.path import join as join_path
 
@@ -11,15 +12,13 @@ import pytest
 import yaml
 
 from launch import launch_docker_compose, teardown_docker_compose
+from testing.corpus_cache import corpus_cache
 from testing.discovery_interface import (
     make_sure_directories_exist,
     validate_interpreter_directory,
 )
-from testing.parse_tests import (
-    add_extension_if_missing,
-    expand_wildcard_tests,
-    load_tests,
-)
+from testing.external_json import acquire, release
+from testing.parse_tests import add_extension_if_missing, expand_wildcard_tests
 
 logging.basicConfig(
     level=logging.INFO,
@@ -28,6 +27,10 @@ logging.basicConfig(
 
 LOGGER = logging.getLogger(__name__)
 
+Case = namedtuple(
+    "Case", ["test_dict", "intents", "nlp_models", "test_name", "test_file", "test_no"]
+)
+
 
 def validate_yaml(intents_config_file):
     """
@@ -55,6 +58,74 @@ def pytest_addoption(parser):
         default=[],
         help="List of text files to test",
     )
+    parser.addoption(
+        "--concurrency",
+        action="store",
+        type=int,
+        default=1,
+        help="Number of requests to keep in flight while testing",
+    )
+    parser.addoption(
+        "--no-cache",
+        action="store_true",
+        default=False,
+        help="Query the services for every test instead of reusing cached responses",
+    )
+    parser.addoption(
+        "--response-cache",
+        action="store_true",
+        default=False,
+        help="Reuse and store cached responses with --use-running-services too; "
+        "only for services that really run the configured images and interpreter",
+    )
+    parser.addoption(
+        "--record-responses",
+        action="store",
+        default=None,
+        help="Append every raw service response to this .jsonl file for replay_server.py",
+    )
+    parser.addoption(
+        "--use-running-services",
+        action="store_true",
+        default=False,
+        help="Test against services already listening, e.g. replay_server.py, "
+        "instead of launching docker. The response cache is off unless --response-cache",
+    )
+    parser.addoption(
+        "--reuse-services",
+        action="store_true",
+        default=False,
+        help="Keep healthy discovery/nlprocessor containers running the configured images, "
+        "syncing only changed interpreter files, and leave them running afterwards. "
+        "Without it every launch copies the whole interpreter",
+    )
+    parser.addoption(
+        "--per-block",
+        action="store_true",
+        default=False,
+        help="Run each test block as one test that submits its transcript once "
+        "and checks all of its expected outputs",
+    )
+    parser.addoption(
+        "--launch-timings",
+        action="store",
+        default=None,
+        help="Save the time spent in each startup phase to this json file",
+    )
+    parser.addoption(
+        "--nlprocessor-concurrency",
+        action="store",
+        type=int,
+        default=None,
+        help="Requests in flight to nlprocessor when pipelining; defaults to --concurrency",
+    )
+    parser.addoption(
+        "--discovery-concurrency",
+        action="store",
+        type=int,
+        default=None,
+        help="Requests in flight to discovery when pipelining; defaults to --concurrency",
+    )
 
 
 def check_discovery_setup(interpreter_directory, tests):
@@ -104,29 +175,48 @@ def clean_test_arguments(tests):
     return test_files
 
 
-def load_test_files(tests):
+def iter_test_cases(tests, per_block=False):
     """
     From a list of test files,
-    return
+    yield every test case along with the file it came from, one file at a time.
+    With per_block, each test block is a single case checking all its expected outputs.
     """
-    test_files = clean_test_arguments(tests)
-    test_dicts = []
-    intents = []
-    nlp_models = []
-    test_names = []
-    for test_file in test_files:
+    load = corpus_cache.load_blocks if per_block else corpus_cache.load
+    for test_file in clean_test_arguments(tests):
         (
             tests_from_this_file,
             test_intents,
             test_nlp_models,
-        ) = load_tests(test_file)
-        test_dicts += tests_from_this_file
-        intents += [test_intents] * len(tests_from_this_file)
-        nlp_models += [test_nlp_models] * len(tests_from_this_file)
-        test_names += [
-            f"{test_file}-{test_dict.get('test','')}"
-            for test_dict in tests_from_this_file
-        ]
+        ) = load(test_file)
+        for test_no, test_dict in enumerate(tests_from_this_file):
+            yield Case(
+                test_dict=test_dict,
+                intents=test_intents,
+                nlp_models=test_nlp_models,
+                test_name=f"{test_file}-{test_dict.get('test','')}",
+                test_file=test_file,
+                test_no=test_no,
+            )
+
+
+def load_test_cases(tests, per_block=False):
+    """
+    From a list of test files,
+    return every test case along with the file it came from
+    """
+    return list(iter_test_cases(tests, per_block))
+
+
+def load_test_files(tests):
+    """
+    From a list of test files,
+    return
+    """
+    cases = load_test_cases(tests)
+    test_dicts = [case.test_dict for case in cases]
+    intents = [case.intents for case in cases]
+    nlp_models = [case.nlp_models for case in cases]
+    test_names = [case.test_name for case in cases]
     return test_dicts, intents, nlp_models, test_names
 
 
@@ -136,15 +226,17 @@ def pytest_generate_tests(metafunc):
     """
     tests = metafunc.config.getoption("tests")
 
-    test_dicts, intents, nlp_models, test_names = load_test_files(tests)
-
     # parametrize test_nlp which usess both nlprocessor and discovery
-    if {"test_dict", "intents", "nlp_models", "test_name"}.issubset(
-        metafunc.fixturenames
-    ):
+    # test_file and test_no are passed along when the test asks for them
+    fields = [field for field in Case._fields if field in metafunc.fixturenames]
+    if {"test_dict", "intents", "nlp_models", "test_name"}.issubset(fields):
+        cases = load_test_cases(tests, metafunc.config.getoption("per_block"))
+        # each case releases its external json when it finishes
+        for case in cases:
+            acquire(case.test_dict.get("external_json"))
         metafunc.parametrize(
-            "test_dict,intents,nlp_models,test_name",
-            zip(test_dicts, intents, nlp_models, test_names),
+            ",".join(fields),
+            [tuple(getattr(case, field) for field in fields) for case in cases],
         )
 
     interpreter_directory = metafunc.config.getoption("interpreter_directory")
@@ -162,3 +254,31 @@ def pytest_generate_tests(metafunc):
             "tests",
             [tests],
         )
+
+
+def item_params(item):
+    """
+    Parameters pytest_generate_tests gave a collected test item, if any
+    """
+    return getattr(getattr(item, "callspec", None), "params", {})
+
+
+def selected_cases(items):
+    """
+    The test cases of the collected items left after -k, -m and --deselect, in run order
+    """
+    for item in items:
+        params = item_params(item)
+        if set(Case._fields).issubset(params):
+            yield Case(*(params[field] for field in Case._fields))
+
+
+def pytest_deselected(items):
+    """
+    Release the external json of cases -k, -m or --deselect removed,
+    since they will never run to release it themselves
+    """
+    for item in items:
+        test_dict = item_params(item).get("test_dict")
+        if test_dict:
+            release(test_dict.get("external_json"))
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Re-grade a corpus against raw responses recorded by an earlier run, with no services running.
+
+Record responses during a real run with
+    python3 -m pytest test_nlp.py ... --record-responses responses.jsonl
+then, after changing test files, grade them again in bulk with
+    python3 evaluate.py responses.jsonl examples/*_tests.txt --processes 8
+
+Test files follow the response store, so a glob may be expanded by the shell
+or quoted and expanded here; every other option must be given by name.
+
+Each test case is matched to the payload it would have sent, so a test whose
+transcript, models, intents or external json changed has no recorded response and fails.
+"""
+
+import logging
+import sys
+from collections import defaultdict
+
+from fire import Fire
+
+from conftest import iter_test_cases
+from testing.offline_evaluation import (
+    CHUNK_SIZE,
+    evaluate_files,
+    response_finder,
+    summarize_results,
+)
+from testing.output_tests import print_failures, record_results
+from testing.response_store import load_responses
+
+# evaluation logs every failed expectation at INFO, too much for a whole corpus
+logging.basicConfig(
+    level=logging.WARNING,
+    format="%(levelname)-8s - %(asctime)s - %(name)s :: %(message)s",
+)
+
+
+def pair_cases_with_responses(tests, responses):
+    """
+    Pair every test case with its recorded response, grouped by test file
+    """
+    find = response_finder(responses)
+    pairs_by_file = defaultdict(list)
+    for case in iter_test_cases(tests):
+        resp = find(
+            case.test_dict["transcript"],
+            case.intents,
+            case.nlp_models,
+            case.test_dict.get("external_json", {}),
+        )
+        pairs_by_file[case.test_file].append((case.test_dict, resp))
+    return pairs_by_file
+
+
+def run(
+    responses,
+    *tests,
+    processes=None,
+    chunk_size=CHUNK_SIZE,
+    save_results=False,
+    show_failures=True,
+):
+    """
+    Grade test files against a response store and record the results of each file.
+
+    :param responses: str, .jsonl file written by --record-responses
+    :param tests: test files; wildcards are expanded
+    :param processes: int, worker processes; defaults to one per cpu; 1 grades in this process
+    :param chunk_size: int, test cases graded per task sent to a worker
+    :param save_results: bool, save results and intent metrics under results/
+    :param show_failures: bool, print a table of each file's failures
+    :return: bool, whether every test passed
+    """
+    assert tests, "Give at least one test file after the response store"
+    stored = load_responses(responses)
+    print(f"Loaded {len(stored)} recorded responses from {responses}")
+
+    pairs_by_file = pair_cases_with_responses(tests, stored)
+    missing = sum(resp is None for pairs in pairs_by_file.values() for _, resp in pairs)
+    if missing:
+        print(f"{missing} test cases have no recorded response")
+
+    evaluated = evaluate_files(pairs_by_file, processes, chunk_size)
+
+    passed = True
+    for test_file, (results, seconds) in evaluated.items():
+        output_dict = summarize_results(test_file, results, seconds)
+        if show_failures and output_dict["test_failures"]:
+            print_failures(output_dict["test_failures"])
+        passed = record_results(output_dict, save_results) and passed
+    return passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if Fire(run) else 1)
@@ -5,34 +5,20 @@ from collections import namedtuple
 
 import dotenv
 import pandas as pd
-import requests
 import streamlit as st
 from PIL import Image
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 
 from launch import wait_on_service
 from testing.discovery_interface import (
     reload_discovery_config,
     submit_discovery_transcript,
 )
+from testing.http_client import make_retrying_session
 
 env = dotenv.dotenv_values("client.env")
 
 
-class RetryRequest(Retry):
-    """
-    Custom retry class with max backoff set to TIMEOUT from client.env
-    """
-
-    BACKOFF_MAX = float(env["TIMEOUT"])
-
-
-retries = RetryRequest(
-    total=int(env["RETRIES"]), backoff_factor=1.0, status_forcelist=[500, 502, 503, 504]
-)
-request_session = requests.Session()
-request_session.mount("http://", HTTPAdapter(max_retries=retries))
+request_session = make_retrying_session()
 
 ENCODING = "utf-8"
 
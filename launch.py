@@ -3,13 +3,18 @@
 Utilities to initialize volumes and stand up services using docker compose
 """
 
-import glob
 import io
+import json
 import logging
 import os
 import sys
 import tarfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from enum import Enum
+from stat import S_IMODE
 
 import docker
 import dotenv
@@ -17,8 +22,17 @@ import requests
 from compose.cli.main import main as docker_compose
 from fire import Fire
 from mock import patch
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+
+from testing import http_client
+from testing.discovery_interface import reload_discovery_config
+from testing.fingerprint import (
+    CHUNK_SIZE,
+    canonical_digest,
+    directory_digest,
+    directory_manifest,
+    iter_directory_files,
+)
+from testing.single_flight import SingleFlight
 
 env = dotenv.dotenv_values("client.env")
 logging.basicConfig(
@@ -31,6 +45,17 @@ LOGGER = logging.getLogger(__name__)
 BUILTIN_DISCOVERY_MODELS = "builtin-discovery-models"
 CUSTOM_DISCOVERY_INTERPRETER = "custom-discovery-interpreter"
 BUILTIN_NLPROCESSOR_MODELS = "builtin-nlprocessor-models"
+# written alongside the interpreter so a running discovery can be matched to a directory
+INTERPRETER_MANIFEST = ".sdk_manifest.json"
+# builtin model volumes record the init image they were filled from
+INIT_IMAGE_LABEL = "com.greenkeytech.sdk.init-image"
+# suffix of the empty volume created, with the same label, once a builtin model volume
+# is completely filled; volume labels can't be changed after the volume is created
+COMPLETE_SUFFIX = "-complete"
+
+# seconds between readiness probes, and how long a service gets to come up
+READINESS_INTERVAL = float(env.get("READINESS_INTERVAL") or 0.25)
+READINESS_TIMEOUT = float(env["TIMEOUT"]) * int(env["RETRIES"])
 
 
 def get_docker_client():
@@ -41,32 +66,117 @@ def get_docker_client():
     return docker.client.from_env()
 
 
-class RetryRequest(Retry):
+class LaunchTarget(Enum):
+    everything = "everything"
+    discovery = "discovery"
+    nlprocessor = "nlprocessor"
+
+
+def target_services(target):
     """
-    Custom retry class with max backoff set to TIMEOUT from client.env
+    Services a launch target stands up
     """
+    return [
+        service
+        for service in (LaunchTarget.discovery, LaunchTarget.nlprocessor)
+        if target in [service, LaunchTarget.everything]
+    ]
 
-    BACKOFF_MAX = float(env["TIMEOUT"])
 
+def service_image(service):
+    """
+    Image configured in client.env for discovery or nlprocessor
+    """
+    return "docker.greenkeytech.com/{}:{}".format(
+        service.value, env[f"{service.value.upper()}_TAG"]
+    )
 
-retries = RetryRequest(
-    total=int(env["RETRIES"]), backoff_factor=1.0, status_forcelist=[500, 502, 503, 504]
-)
-request_session = requests.Session()
-request_session.mount("http://", HTTPAdapter(max_retries=retries))
 
+def service_address(service):
+    return ":".join(
+        [env[f"{service.value.upper()}_HOST"], env[f"{service.value.upper()}_PORT"]]
+    )
 
-class LaunchTarget(Enum):
-    everything = "everything"
-    discovery = "discovery"
-    nlprocessor = "nlprocessor"
 
+# launch steps running side by side share one pull of a common image such as busybox
+pulls = SingleFlight()
 
-def pull_image(image):
+
+@contextmanager
+def timed_step(name, timings=None):
     """
-    Try to pull the most up to date version of this image.
-    If internet connectivity is down, don't error.
+    Log how long a launch step takes, also recording it in timings if given
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        LOGGER.info("%s took %.1f seconds", name, seconds)
+        if timings is not None:
+            timings[name] = round(seconds, 3)
+
+
+def run_step(name, func, *args, timings=None):
+    with timed_step(name, timings):
+        return func(*args)
+
+
+def run_steps(steps, timings=None):
+    """
+    Run independent (name, func, *args) steps concurrently,
+    waiting for all of them and raising the first failure
     """
+    with ThreadPoolExecutor(max_workers=max(len(steps), 1)) as executor:
+        futures = [executor.submit(run_step, *step, timings=timings) for step in steps]
+    for future in futures:
+        future.result()
+
+
+class StartupTimings:
+    """
+    Durations of each launch phase, and of the steps run concurrently within them
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self.phases = {}
+        self.steps = {}
+
+    def phase(self, name):
+        return timed_step(name, self.phases)
+
+    def to_dict(self):
+        return {
+            "target": self.target.value,
+            "images": {
+                key: env[key]
+                for key in (
+                    "DISCOVERY_TAG",
+                    "INIT_DISCOVERY_TAG",
+                    "NLPROCESSOR_TAG",
+                    "INIT_NLPROCESSOR_TAG",
+                )
+            },
+            "phases": self.phases,
+            "steps": self.steps,
+            "total": round(sum(self.phases.values()), 3),
+        }
+
+    def report(self):
+        print(f"\nStartup of {self.target.value}")
+        for name, seconds in self.phases.items():
+            print("{:<40s}{:>10.1f}s".format(name, seconds))
+        for name, seconds in self.steps.items():
+            print("  {:<38s}{:>10.1f}s".format(name, seconds))
+        print("{:<40s}{:>10.1f}s\n".format("total", sum(self.phases.values())))
+
+    def save(self, path):
+        with open(path, "w") as fl:
+            json.dump(self.to_dict(), fl, indent=2)
+
+
+def _pull_image(image):
     try:
         if env.get("AUTOMATICALLY_PULL_IMAGES").title() == "True":
             get_docker_client().images.pull(image)
@@ -76,6 +186,14 @@ def pull_image(image):
         )
 
 
+def pull_image(image):
+    """
+    Try to pull the most up to date version of this image.
+    If internet connectivity is down, don't error.
+    """
+    pulls.do(image, _pull_image, image)
+
+
 def fix_volume_permissions(volume, folder):
     busybox_tag = env["BUSYBOX_TAG"]
     busybox_image = f"busybox:{busybox_tag}"
@@ -90,73 +208,204 @@ def fix_volume_permissions(volume, folder):
     )
 
 
-def load_builtin_discovery_models():
+def local_image_id(image):
+    """
+    Id of an image in the local registry, failing with how to get it if it is missing
+    """
+    try:
+        return get_docker_client().images.get(image).id
+    except docker.errors.ImageNotFound:
+        raise Exception(
+            f"Image {image} not found locally. Pull it with `docker pull {image}` "
+            "or set AUTOMATICALLY_PULL_IMAGES=True in client.env"
+        ) from None
+
+
+def volume_init_image(volume_name):
+    """
+    Id of the init image a builtin model volume was completely filled from, if it exists.
+    A volume left half filled, e.g. by a killed run, has no completion marker.
+    """
+    try:
+        vol = get_docker_client().volumes.get(volume_name)
+        marker = get_docker_client().volumes.get(volume_name + COMPLETE_SUFFIX)
+    except docker.errors.NotFound:
+        return None
+    image_id = (vol.attrs.get("Labels") or {}).get(INIT_IMAGE_LABEL)
+    if image_id != (marker.attrs.get("Labels") or {}).get(INIT_IMAGE_LABEL):
+        return None
+    return image_id
+
+
+def remove_builtin_models(volume_name):
+    """
+    Remove a builtin model volume along with its completion marker, marker first
+    """
+    remove_volume(volume_name + COMPLETE_SUFFIX)
+    remove_volume(volume_name)
+
+
+def load_builtin_models(volume_name, init_image, folder):
     """
     Create a docker volume,
     attach it to a busybox container,
-    and load the GK interpreter models into that container
+    and load the models from an init image into that container.
+    A volume already filled from the same image is kept as is.
     """
+    pull_image(init_image)
+    image_id = local_image_id(init_image)
+    if volume_init_image(volume_name) == image_id:
+        LOGGER.info("%s is up to date with %s", volume_name, init_image)
+        return
 
     # copy default models in
-    remove_volume(BUILTIN_DISCOVERY_MODELS)
-    builtin_models = get_docker_client().volumes.create(name=BUILTIN_DISCOVERY_MODELS)
-    folder = "/models"
-    fix_volume_permissions(builtin_models, folder)
+    remove_builtin_models(volume_name)
+    builtin_models = get_docker_client().volumes.create(
+        name=volume_name, labels={INIT_IMAGE_LABEL: image_id}
+    )
+    try:
+        fix_volume_permissions(builtin_models, folder)
+        initcontainer = get_docker_client().containers.run(
+            init_image,
+            auto_remove=False,
+            detach=True,
+            volumes={builtin_models.name: {"bind": folder, "mode": "rw"}},
+        )
+        initcontainer.start()
+        status = initcontainer.wait()
+        initcontainer.remove(force=True)
+        if status.get("StatusCode"):
+            raise Exception(f"{init_image} failed to load models into {volume_name}")
+    except BaseException:
+        # a volume holding part of the models is never marked complete
+        remove_volume(volume_name)
+        raise
+    get_docker_client().volumes.create(
+        name=volume_name + COMPLETE_SUFFIX, labels={INIT_IMAGE_LABEL: image_id}
+    )
+
 
+def load_builtin_discovery_models():
+    """
+    Load the GK interpreter models into their volume
+    """
     initdiscovery_tag = env["INIT_DISCOVERY_TAG"]
     initdiscovery_project = "docker.greenkeytech.com/greenkey-discovery-sdk-private"
-    initdiscovery_image = f"{initdiscovery_project}:{initdiscovery_tag}"
-    pull_image(initdiscovery_image)
-    initcontainer = get_docker_client().containers.run(
-        initdiscovery_image,
-        auto_remove=False,
-        detach=True,
-        volumes={builtin_models.name: {"bind": folder, "mode": "rw"}},
+    load_builtin_models(
+        BUILTIN_DISCOVERY_MODELS,
+        f"{initdiscovery_project}:{initdiscovery_tag}",
+        "/models",
     )
-    initcontainer.start()
-    initcontainer.wait()
-    initcontainer.remove(force=True)
 
 
 def load_builtin_nlprocessor_models():
     """
-    Create a docker volume,
-    attach it to a busybox container,
-    and load the GK nlprocessor models into that container
+    Load the GK nlprocessor models into their volume
     """
-
-    # copy default models in
-    remove_volume(BUILTIN_NLPROCESSOR_MODELS)
-    builtin_models = get_docker_client().volumes.create(name=BUILTIN_NLPROCESSOR_MODELS)
-    folder = "/models/transformers"
-    fix_volume_permissions(builtin_models, folder)
     initnlprocessor_tag = env["INIT_NLPROCESSOR_TAG"]
     initnlprocessor_project = "docker.greenkeytech.com/nlpmodelcontroller"
-    initnlprocessor_image = f"{initnlprocessor_project}:{initnlprocessor_tag}"
-    pull_image(initnlprocessor_image)
-    initcontainer = get_docker_client().containers.run(
-        initnlprocessor_image,
-        auto_remove=False,
-        detach=True,
-        volumes={builtin_models.name: {"bind": folder, "mode": "rw"}},
+    load_builtin_models(
+        BUILTIN_NLPROCESSOR_MODELS,
+        f"{initnlprocessor_project}:{initnlprocessor_tag}",
+        "/models/transformers",
     )
-    initcontainer.start()
-    initcontainer.wait()
-    initcontainer.remove(force=True)
 
 
-def load_custom_model(interpreter_directory):
+def tar_header(arcname, path=None, type=tarfile.REGTYPE):
     """
-    Create a docker volume, attach it to a busybox container, and load our interpreter into that container
+    Tar header for arcname with the mode, owner and mtime of path, as tarfile.add keeps them.
+    Content that has no path gets the tarfile defaults.
     """
-    if not os.path.isdir(interpreter_directory):
-        raise Exception(f"Interpreter directory {interpreter_directory} not found")
+    info = tarfile.TarInfo(arcname)
+    info.type = type
+    if path is None:
+        info.mode = 0o755 if type == tarfile.DIRTYPE else 0o644
+        info.mtime = time.time()
+    else:
+        stat = os.stat(path)
+        info.mode = S_IMODE(stat.st_mode)
+        info.uid, info.gid, info.mtime = stat.st_uid, stat.st_gid, stat.st_mtime
+        if type == tarfile.REGTYPE:
+            info.size = stat.st_size
+    return info
+
+
+def iter_tar(entries):
+    """
+    Stream a tar archive of (arcname, path) entries chunk by chunk, so only one
+    chunk of a large entity file is ever in memory.
+    A path may also be bytes to store in place of a file.
+    Parent directories are written before the first file beneath them.
+    """
+    directories = set()
+    for arcname, source in entries:
+        parents = os.path.dirname(arcname).split("/")
+        for depth in range(1, len(parents) + 1):
+            directory = "/".join(parents[:depth])
+            if directory and directory not in directories:
+                directories.add(directory)
+                # the directory on disk is as many levels above source
+                directory_path = None
+                if not isinstance(source, bytes):
+                    directory_path = source
+                    for _ in range(len(parents) - depth + 1):
+                        directory_path = os.path.dirname(directory_path)
+                info = tar_header(directory, directory_path, tarfile.DIRTYPE)
+                yield info.tobuf(tarfile.GNU_FORMAT)
+
+        if isinstance(source, bytes):
+            info = tar_header(arcname)
+            info.size = len(source)
+            yield info.tobuf(tarfile.GNU_FORMAT)
+            yield source
+            size = info.size
+        else:
+            info = tar_header(arcname, source)
+            yield info.tobuf(tarfile.GNU_FORMAT)
+            size = 0
+            with open(source, "rb") as fl:
+                # the header's size wins if the file changes while it is sent
+                while size < info.size:
+                    chunk = fl.read(min(CHUNK_SIZE, info.size - size))
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    yield chunk
+                yield bytes(info.size - size)
+                size = info.size
+
+        if size % tarfile.BLOCKSIZE:
+            yield bytes(tarfile.BLOCKSIZE - size % tarfile.BLOCKSIZE)
+
+    yield bytes(tarfile.BLOCKSIZE * 2)
+
+
+def read_manifest(container, directory):
+    """
+    Interpreter manifest stored in directory of a container, or None if there is none
+    """
+    try:
+        stream, _ = container.get_archive(f"{directory}/{INTERPRETER_MANIFEST}")
+    except docker.errors.NotFound:
+        return None
+    with tarfile.open(fileobj=io.BytesIO(b"".join(stream))) as tar:
+        return json.loads(tar.extractfile(INTERPRETER_MANIFEST).read())
 
-    # copy custom model in
-    remove_volume(CUSTOM_DISCOVERY_INTERPRETER)
-    vol = get_docker_client().volumes.create(name=CUSTOM_DISCOVERY_INTERPRETER)
-    source = interpreter_directory
+
+def copy_custom_model(vol, interpreter_directory):
+    """
+    Sync an interpreter into a volume through a busybox container.
+    Only files whose digest or mode differs from the manifest of the last sync are sent,
+    keeping their mode, and files since removed from the directory are deleted.
+    The volume only outlives a run with --reuse-services, see launch_docker_compose;
+    otherwise teardown removes it and every launch sends the whole interpreter.
+    """
     destination = "/data"
+    paths = dict(iter_directory_files(interpreter_directory))
+    files = directory_manifest(interpreter_directory)
+    modes = {path: S_IMODE(os.stat(paths[path]).st_mode) for path in files}
+    manifest = {"interpreter": canonical_digest(files), "files": files, "modes": modes}
+
     busybox_image = f"busybox:{env['BUSYBOX_TAG']}"
     pull_image(busybox_image)
     busybox = get_docker_client().containers.run(
@@ -166,14 +415,68 @@ def load_custom_model(interpreter_directory):
         detach=True,
         volumes={vol.name: {"bind": destination, "mode": "rw"}},
     )
-    file_like_object = io.BytesIO()
-    with tarfile.open(fileobj=file_like_object, mode="w") as tar:
-        for fl in glob.glob(os.path.join(source, "*")):
-            tar.add(fl, arcname=fl.replace(source, ""))
-    file_like_object.seek(0)
-    data = file_like_object.read()
-    busybox.put_archive(destination, data)
-    busybox.remove(force=True)
+    try:
+        previous = read_manifest(busybox, destination)
+        if previous is None:
+            # unknown contents, start from an empty volume
+            busybox.exec_run(["sh", "-c", f"rm -rf {destination}/* {destination}/.??*"])
+            previous = {"files": {}}
+
+        previous_modes = previous.get("modes", {})
+        changed = [
+            relative_path
+            for relative_path, digest in files.items()
+            if previous["files"].get(relative_path) != digest
+            or previous_modes.get(relative_path) != modes[relative_path]
+        ]
+        removed = [
+            f"{destination}/{relative_path}"
+            for relative_path in previous["files"]
+            if relative_path not in files
+        ]
+        LOGGER.info(
+            "Syncing interpreter: %d of %d files changed, %d removed",
+            len(changed),
+            len(files),
+            len(removed),
+        )
+        if removed:
+            busybox.exec_run(["rm", "-f"] + removed)
+        entries = [(relative_path, paths[relative_path]) for relative_path in changed]
+        # the manifest goes last so an interrupted sync is redone next time
+        entries.append((INTERPRETER_MANIFEST, json.dumps(manifest).encode()))
+        busybox.put_archive(destination, iter_tar(entries))
+    finally:
+        busybox.remove(force=True)
+
+
+def load_custom_model(interpreter_directory):
+    """
+    Create a docker volume, attach it to a busybox container, and load our interpreter into that container.
+    An existing volume, still mounted by a running discovery, is synced in place.
+    """
+    if not os.path.isdir(interpreter_directory):
+        raise Exception(f"Interpreter directory {interpreter_directory} not found")
+
+    # copy custom model in
+    try:
+        vol = get_docker_client().volumes.get(CUSTOM_DISCOVERY_INTERPRETER)
+    except docker.errors.NotFound:
+        vol = get_docker_client().volumes.create(name=CUSTOM_DISCOVERY_INTERPRETER)
+    copy_custom_model(vol, interpreter_directory)
+
+
+def sync_custom_model(interpreter_directory):
+    """
+    Sync the interpreter in the custom volume while discovery keeps running
+    and ask discovery to reload it
+    """
+    if not os.path.isdir(interpreter_directory):
+        raise Exception(f"Interpreter directory {interpreter_directory} not found")
+
+    vol = get_docker_client().volumes.get(CUSTOM_DISCOVERY_INTERPRETER)
+    copy_custom_model(vol, interpreter_directory)
+    return reload_discovery_config()
 
 
 def create_dummy_custom_model():
@@ -185,20 +488,152 @@ def create_dummy_custom_model():
     get_docker_client().volumes.create(name=CUSTOM_DISCOVERY_INTERPRETER)
 
 
-def wait_on_service(address):
-    return request_session.get(
-        "/".join([address, "ping"]), timeout=float(env["TIMEOUT"])
+def watch_container(container, exited, logs, stop):
+    """
+    Set exited, keeping the container's last logs, if it stops before stop is set
+    """
+    while not stop.wait(READINESS_INTERVAL):
+        try:
+            container.reload()
+        except docker.errors.NotFound:
+            exited.set()
+            return
+        if container.status in ("exited", "dead"):
+            logs.append(container.logs(tail=20).decode(errors="replace"))
+            exited.set()
+            return
+
+
+def wait_on_service(address, container=None, timeout=READINESS_TIMEOUT):
+    """
+    Poll /ping every READINESS_INTERVAL seconds until the service answers.
+    Given its container, fail as soon as it exits instead of waiting out the timeout.
+    """
+    url = "/".join([address, "ping"])
+    exited = threading.Event()
+    stop = threading.Event()
+    logs = []
+    if container is not None:
+        threading.Thread(
+            target=watch_container, args=(container, exited, logs, stop), daemon=True
+        ).start()
+
+    deadline = time.perf_counter() + timeout
+    try:
+        while True:
+            try:
+                response = http_client.get(url, timeout=float(env["TIMEOUT"]))
+                if response.status_code == 200:
+                    return response
+            except requests.exceptions.RequestException:
+                pass
+            if exited.is_set():
+                raise Exception(
+                    f"{container.name} exited before {address} was ready:\n{''.join(logs)}"
+                )
+            if time.perf_counter() > deadline:
+                raise Exception(f"{address} not ready after {timeout} seconds")
+            # wakes early if the container exits
+            exited.wait(READINESS_INTERVAL)
+    finally:
+        stop.set()
+
+
+def find_container(service, include_stopped=False):
+    """
+    The compose container for a service if docker knows of one
+    """
+    try:
+        containers = get_docker_client().containers.list(
+            all=include_stopped,
+            filters={"label": f"com.docker.compose.service={service.value}"},
+        )
+    except docker.errors.DockerException:
+        # e.g. services provided by replay_server.py without docker
+        return None
+    return containers[0] if containers else None
+
+
+def wait_for_everything(target, timings=None):
+    """
+    Wait for all services as necessary, side by side
+    """
+    run_steps(
+        [
+            (
+                f"{service.value} ready",
+                wait_on_service,
+                service_address(service),
+                find_container(service, include_stopped=True),
+            )
+            for service in target_services(target)
+        ],
+        timings,
     )
 
 
-def wait_for_everything(target):
+def is_healthy(service):
     """
-    Wait for all services as necessary
+    Single ping without retries
     """
-    if target in [LaunchTarget.discovery, LaunchTarget.everything]:
-        wait_on_service(":".join([env["DISCOVERY_HOST"], env["DISCOVERY_PORT"]]))
-    if target in [LaunchTarget.nlprocessor, LaunchTarget.everything]:
-        wait_on_service(":".join([env["NLPROCESSOR_HOST"], env["NLPROCESSOR_PORT"]]))
+    try:
+        response = http_client.get(
+            "/".join([service_address(service), "ping"]), timeout=float(env["TIMEOUT"])
+        )
+    except requests.exceptions.RequestException:
+        return False
+    return response.status_code == 200
+
+
+def running_interpreter_digest(container):
+    """
+    Interpreter digest from the manifest in a running discovery's custom volume.
+    None when the volume holds no interpreter, as after create_dummy_custom_model.
+    """
+    manifest = read_manifest(container, "/custom")
+    return manifest and manifest["interpreter"]
+
+
+def reuse_running_services(target, interpreter_directory=None):
+    """
+    Reuse services that are already running the configured images and respond to /ping.
+    A discovery serving another interpreter is synced and reloaded rather than restarted.
+    Returns False if anything has to be launched from scratch.
+    """
+    containers = {}
+    for service in target_services(target):
+        container = find_container(service)
+        if container is None:
+            LOGGER.info("No running %s to reuse", service.value)
+            return False
+        if container.attrs["Config"]["Image"] != service_image(service):
+            LOGGER.info(
+                "Running %s uses %s, not %s",
+                service.value,
+                container.attrs["Config"]["Image"],
+                service_image(service),
+            )
+            return False
+        if not is_healthy(service):
+            LOGGER.info("Running %s is not responding", service.value)
+            return False
+        containers[service] = container
+
+    if LaunchTarget.discovery in containers:
+        running_digest = running_interpreter_digest(containers[LaunchTarget.discovery])
+        if running_digest != directory_digest(interpreter_directory):
+            if not interpreter_directory:
+                LOGGER.info("Running discovery has a custom interpreter loaded")
+                return False
+            LOGGER.info("Syncing interpreter %s to discovery", interpreter_directory)
+            if not sync_custom_model(interpreter_directory):
+                LOGGER.warning("Discovery failed to reload the synced interpreter")
+                return False
+
+    LOGGER.info(
+        "Reusing running %s", ", ".join(service.value for service in containers)
+    )
+    return True
 
 
 def check_for_license():
@@ -210,49 +645,69 @@ def check_for_license():
     ), "LICENSE_KEY needed. Please set in your environment or client.env"
 
 
-def create_volumes(target, interpreter_directory):
+def volume_steps(target, interpreter_directory):
     """
-    Create volumes as needed
+    Steps creating the volumes a target needs, each independent of the others
     """
-
     if interpreter_directory:
-        load_custom_model(interpreter_directory)
+        steps = [
+            ("custom interpreter volume", load_custom_model, interpreter_directory)
+        ]
     else:
-        create_dummy_custom_model()
+        steps = [("empty interpreter volume", create_dummy_custom_model)]
 
     if target in [LaunchTarget.discovery, LaunchTarget.everything]:
-        load_builtin_discovery_models()
+        steps.append(("builtin discovery models", load_builtin_discovery_models))
     if target in [LaunchTarget.nlprocessor, LaunchTarget.everything]:
-        load_builtin_nlprocessor_models()
+        steps.append(("builtin nlprocessor models", load_builtin_nlprocessor_models))
+    return steps
 
 
-def stand_up_compose(target):
+def pull_steps(target):
+    """
+    Steps pulling the service images a target runs
+    """
+    return [
+        (f"pull {service_image(service)}", pull_image, service_image(service))
+        for service in target_services(target)
+    ]
+
+
+def create_volumes(target, interpreter_directory):
+    """
+    Create volumes as needed
+    """
+    run_steps(volume_steps(target, interpreter_directory))
+
+
+def stand_up_compose(target, pull=True):
     """
     Stand up compose based on target
     """
     args = ["docker-compose", "--env-file", "client.env"]
 
-    if target in [LaunchTarget.discovery, LaunchTarget.everything]:
-        discovery_image = f"docker.greenkeytech.com/discovery:{env['DISCOVERY_TAG']}"
-        pull_image(discovery_image)
-        args += ["-f", "discovery.yaml"]
-    if target in [LaunchTarget.nlprocessor, LaunchTarget.everything]:
-        nlprocessor_image = (
-            f"docker.greenkeytech.com/nlprocessor:{env['NLPROCESSOR_TAG']}"
-        )
-        pull_image(nlprocessor_image)
-        args += ["-f", "nlprocessor.yaml"]
+    for service in target_services(target):
+        if pull:
+            pull_image(service_image(service))
+        args += ["-f", f"{service.value}.yaml"]
 
     args += ["up", "-d", "--force-recreate"]
     with patch.object(sys, "argv", args):
         docker_compose()
 
 
-def prune_volumes():
+def prune_volumes(keep=()):
     """
-    Prune any volumes not in use
+    Remove any volumes not in use, except builtin models kept for the next launch
+    and the volumes named in keep
     """
-    get_docker_client().volumes.prune()
+    for vol in get_docker_client().volumes.list(filters={"dangling": True}):
+        if vol.name in keep or INIT_IMAGE_LABEL in (vol.attrs.get("Labels") or {}):
+            continue
+        try:
+            vol.remove()
+        except docker.errors.APIError:
+            LOGGER.info("Could not remove volume %s", vol.name)
 
 
 def prune_containers():
@@ -262,22 +717,49 @@ def prune_containers():
     get_docker_client().containers.prune()
 
 
-def launch_docker_compose(target="everything", interpreter_directory=None):
+def launch_docker_compose(
+    target="everything", interpreter_directory=None, reuse=False, timings=None
+):
     """
-    Launch docker compose with either both discovery and nlprocessor or just one
+    Launch docker compose with either both discovery and nlprocessor or just one.
+    With reuse, healthy services already running the same images are kept
+    and only the interpreter files that changed are synced.
+    Without it the interpreter volume is pruned and copied in full.
+    A breakdown of the time spent in each phase is printed,
+    and saved as json to the timings path if given.
     """
     check_for_license()
 
     target = LaunchTarget(target)
+    startup = StartupTimings(target)
+    reused = False
+    if reuse:
+        with startup.phase("reuse check"):
+            reused = reuse_running_services(target, interpreter_directory)
+
+    if not reused:
+        with startup.phase("prune"):
+            prune_containers()
+            # a reused interpreter volume lets the next sync send only changed files
+            prune_volumes(keep=[CUSTOM_DISCOVERY_INTERPRETER] if reuse else [])
+
+        # volumes and images don't depend on each other; compose needs all of them
+        with startup.phase("volumes and pull"):
+            run_steps(
+                volume_steps(target, interpreter_directory) + pull_steps(target),
+                startup.steps,
+            )
 
-    prune_containers()
-    prune_volumes()
-    create_volumes(target, interpreter_directory)
+        with startup.phase("compose up"):
+            stand_up_compose(target, pull=False)
 
-    stand_up_compose(target)
+        # block until ready
+        with startup.phase("readiness"):
+            wait_for_everything(target, startup.steps)
 
-    # block until ready
-    wait_for_everything(target)
+    startup.report()
+    if timings:
+        startup.save(timings)
 
 
 def remove_volume(volume_name):
@@ -296,9 +778,10 @@ def remove_volume(volume_name):
         pass
 
 
-def teardown_docker_compose():
+def teardown_docker_compose(remove_models=False):
     """
-    Teardown docker compose
+    Teardown docker compose.
+    Builtin model volumes are kept for the next launch unless remove_models is set.
     """
     args = [
         "docker-compose",
@@ -313,12 +796,10 @@ def teardown_docker_compose():
     with patch.object(sys, "argv", args):
         docker_compose()
 
-    for volume_name in [
-        CUSTOM_DISCOVERY_INTERPRETER,
-        BUILTIN_DISCOVERY_MODELS,
-        BUILTIN_NLPROCESSOR_MODELS,
-    ]:
-        remove_volume(volume_name)
+    remove_volume(CUSTOM_DISCOVERY_INTERPRETER)
+    if remove_models:
+        remove_builtin_models(BUILTIN_DISCOVERY_MODELS)
+        remove_builtin_models(BUILTIN_NLPROCESSOR_MODELS)
 
 
 if __name__ == "__main__":
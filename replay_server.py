@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for Discovery and NLProcessor that replays recorded responses.
+
+Record responses during a real run with
+    python3 -m pytest test_nlp.py ... --record-responses responses.jsonl
+then serve them without docker, a license or a network with
+    python3 replay_server.py responses.jsonl --latency lognormal:20,0.5
+and test or benchmark against them with
+    python3 -m pytest test_nlp.py ... --use-running-services
+    python3 benchmark.py examples/digit_tests.txt
+Neither uses the response cache here, so every request reaches this server
+and replayed responses are never cached as answers of the real services.
+
+Each service listens on the host and port configured in client.env and answers
+/ping, /developer and /process with the shapes the SDK expects.
+A payload that was never recorded gets a 404, which the SDK reports as a failed request.
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import dotenv
+from fire import Fire
+
+from testing.response_store import iter_records, payload_key
+
+env = dotenv.dotenv_values("client.env")
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(levelname)-8s - %(asctime)s - %(name)s :: %(message)s",
+)
+
+LOGGER = logging.getLogger(__name__)
+
+SERVICES = ("discovery", "nlprocessor")
+
+
+def parse_latency(spec):
+    """
+    Turn a latency spec in milliseconds into a function returning a delay in seconds.
+    Supported: constant:MS, uniform:LOW,HIGH, normal:MEAN,STDEV,
+    lognormal:MEDIAN,SIGMA and exponential:MEAN
+
+    >>> parse_latency("constant:20")()
+    0.02
+    >>> 0.01 <= parse_latency("uniform:10,30")() <= 0.03
+    True
+    >>> parse_latency("none")()
+    0
+    """
+    if not spec or spec == "none":
+        return lambda: 0
+    distribution, _, params = str(spec).partition(":")
+    params = [float(p) for p in params.split(",") if p]
+    samplers = {
+        "constant": lambda ms: ms,
+        "uniform": random.uniform,
+        "normal": random.gauss,
+        "lognormal": lambda median, sigma: median * random.lognormvariate(0, sigma),
+        "exponential": lambda mean: random.expovariate(1 / mean),
+    }
+    assert distribution in samplers, f"Unknown latency distribution {distribution}"
+    sampler = samplers[distribution]
+    return lambda: max(sampler(*params), 0) / 1000
+
+
+def load_recordings(recordings):
+    """
+    Index recorded responses by service and payload digest,
+    and collect the intents seen per service for /developer
+    """
+    responses = {}
+    intents = set()
+    for record in iter_records(recordings):
+        responses[(record["service"], record["digest"])] = record["response"]
+        intents.update(record.get("intents") or [])
+    return responses, sorted(intents)
+
+
+def make_handler(service, responses, intents, latency):
+    """
+    Request handler class answering for one service
+    """
+
+    class ReplayHandler(BaseHTTPRequestHandler):
+        def send_json(self, status, data):
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def read_json(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == "/ping":
+                self.send_json(200, "pong")
+            elif path == "/developer" and service == "discovery":
+                self.send_json(200, {"intents": intents, "entities": {}})
+            else:
+                self.send_json(404, {"result": "failure"})
+
+        def do_POST(self):
+            path = urlparse(self.path).path
+            payload = self.read_json()
+            if path == "/developer" and service == "discovery":
+                self.send_json(200, {"result": "success"})
+                return
+            if path != "/process":
+                self.send_json(404, {"result": "failure"})
+                return
+
+            time.sleep(latency())
+            resp = responses.get(payload_key(service, payload))
+            if resp is None:
+                LOGGER.warning(
+                    "No %s response recorded for %r", service, payload.get("transcript")
+                )
+                self.send_json(404, {"result": "failure"})
+            else:
+                self.send_json(200, resp)
+
+        def log_message(self, format, *args):
+            LOGGER.debug(format, *args)
+
+    return ReplayHandler
+
+
+def service_address(service):
+    host = env[f"{service.upper()}_HOST"].split("://")[-1]
+    return host, int(env[f"{service.upper()}_PORT"])
+
+
+def serve(recordings, services=SERVICES, latency="none"):
+    """
+    Replay recorded responses for the given services until interrupted.
+
+    :param recordings: .jsonl file written with --record-responses
+    :param services: discovery, nlprocessor or both
+    :param latency: delay added to every /process call, e.g. constant:20 or normal:50,10
+    """
+    services = [services] if isinstance(services, str) else list(services)
+    responses, intents = load_recordings(recordings)
+    sample_latency = parse_latency(latency)
+
+    servers = []
+    for service in services:
+        assert service in SERVICES, f"service must be one of {SERVICES}"
+        server = ThreadingHTTPServer(
+            service_address(service),
+            make_handler(service, responses, intents, sample_latency),
+        )
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        LOGGER.info("Replaying %s on %s:%s", service, *service_address(service))
+
+    LOGGER.info("Loaded %d recorded responses", len(responses))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for server in servers:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    Fire(serve)
@@ -8,19 +8,38 @@ Discovery interpreter.
 Tests pass if the defined entities are present in the most
 likely found intent.
 """
-import functools
 import logging
 import sys
 
 import dotenv
 import pytest
 
-from conftest import check_discovery_setup, identify_what_to_launch
-from freeze import freezeargs
-from launch import launch_docker_compose, teardown_docker_compose
-from testing.discovery_interface import submit_discovery_transcript
-from testing.evaluate_tests import evaluate_entities_and_schema, is_valid_response
-from testing.nlprocessor_interface import submit_nlprocessor_transcript
+from conftest import check_discovery_setup, identify_what_to_launch, selected_cases
+from launch import (
+    LaunchTarget,
+    launch_docker_compose,
+    teardown_docker_compose,
+    wait_for_everything,
+)
+from testing.discovery_interface import (
+    make_discovery_payload,
+    submit_discovery_transcript,
+)
+from testing.dispatch import Prefetcher, StagedPipeline
+from testing.evaluate_tests import (
+    evaluate_block,
+    evaluate_entities_and_schema,
+    is_valid_response,
+)
+from testing.external_json import release
+from testing.http_client import POOL_SIZE, configure_session
+from testing.latency import CaseInfo, LatencyRecorder, case_context, expected_intent
+from testing.nlprocessor_interface import (
+    make_nlprocessor_payload,
+    submit_nlprocessor_transcript,
+)
+from testing.response_cache import DiskCache, MemoryCache, memoize
+from testing.response_store import ResponseStore
 
 logging.basicConfig(
     level=logging.INFO,
@@ -30,16 +49,95 @@ logging.basicConfig(
 LOGGER = logging.getLogger(__name__)
 env = dotenv.dotenv_values("client.env")
 
-# enable LRU caching if a test transcript and arguments are duplicated
-submit_nlprocessor_transcript = freezeargs(
-    functools.lru_cache(maxsize=None)(submit_nlprocessor_transcript)
+# time every request that actually reaches a service
+latency_recorder = LatencyRecorder()
+
+# reuse responses from previous runs whose payload and service versions match
+response_cache = DiskCache()
+
+# responses reused within this run, held under a fixed memory budget
+memory_cache = MemoryCache()
+
+# optionally keep every raw response for replay_server.py
+response_store = ResponseStore(None)
+
+
+def wrap_submit(service, submit, make_payload):
+    """
+    Time requests that reach the service, reuse responses from previous runs,
+    record raw responses, and reuse responses within this run
+    if a test transcript and arguments are duplicated.
+    Both services share one in-memory budget.
+    """
+    submit = latency_recorder.timed(service, submit)
+    submit = response_cache.wrap(service, submit, make_payload)
+    submit = response_store.wrap(service, submit, make_payload)
+    return memoize(submit, memory_cache, namespace=service)
+
+
+submit_nlprocessor_transcript = wrap_submit(
+    "nlprocessor", submit_nlprocessor_transcript, make_nlprocessor_payload
 )
 
-submit_discovery_transcript = freezeargs(
-    functools.lru_cache(maxsize=None)(submit_discovery_transcript)
+submit_discovery_transcript = wrap_submit(
+    "discovery", submit_discovery_transcript, make_discovery_payload
 )
 
 
+def submit_nlp_stack(transcript, intents, nlp_models, external_json):
+    """
+    Post a transcript to nlprocessor and/or discovery and return the final response
+    """
+    resp = {}
+    # post to nlprocessor
+    if nlp_models:
+        resp = submit_nlprocessor_transcript(transcript, nlp_models, external_json)
+        # merge nlprocessor output into a copy so shared external_json stays untouched
+        external_json = {**external_json, **resp}
+
+    # post to discovery
+    if intents:
+        resp = submit_discovery_transcript(transcript, intents, external_json)
+
+    return resp
+
+
+prefetcher = Prefetcher(submit_nlp_stack)
+
+
+def prefetch_responses(items, nlprocessor_concurrency, discovery_concurrency):
+    """
+    Start requesting responses for the test cases of the selected session items,
+    pipelining nlprocessor and discovery with their own concurrency limits
+    """
+    configure_session(max(nlprocessor_concurrency + discovery_concurrency, POOL_SIZE))
+    pipeline = StagedPipeline(
+        submit_nlprocessor_transcript,
+        submit_discovery_transcript,
+        nlprocessor_concurrency,
+        discovery_concurrency,
+    )
+    prefetcher.start(pipeline)
+    for case in selected_cases(items):
+        transcript = case.test_dict["transcript"]
+        with case_context(
+            CaseInfo(
+                case.test_file,
+                case.test_no,
+                case.test_name,
+                transcript,
+                expected_intent(case.test_dict),
+            )
+        ):
+            prefetcher.submit(
+                transcript,
+                case.intents,
+                case.nlp_models,
+                case.test_dict.get("external_json", {}),
+            )
+    LOGGER.info("Dispatched %d unique requests", len(prefetcher.futures))
+
+
 def format_bad_response(test_name, message, resp):
     """
     Format bad response output
@@ -59,30 +157,55 @@ def format_bad_entities(test_name, test_results):
     return msg
 
 
-def test_nlp_stack(test_dict, intents, nlp_models, test_name):
+def format_bad_block(test_name, block_results):
+    """
+    Format every failed expected output of a test block for pytest output
+    """
+    msg = f"{test_name}\n"
+    for label, value, test_results in block_results:
+        if not test_results.get("total_errors"):
+            continue
+        if not test_results["test_failures"]:
+            msg += f"Expected {label}: {value}\n"
+            msg += f"Observed intents: {test_results['observed_intents']}\n"
+        for failure in test_results["test_failures"]:
+            msg += f"Expected {failure[1]}: {failure[2]}\n"
+            msg += f"Observed {failure[1]}: {failure[3]}\n"
+
+    return msg
+
+
+def test_nlp_stack(test_dict, intents, nlp_models, test_name, test_file, test_no):
     """
-    Test a single test dict with both nlprocessor and discovery
+    Test a single test dict with both nlprocessor and discovery.
+    With --per-block, test_dict is a whole test block and all its expected outputs are checked.
     """
     test_dict = test_dict.copy()
     transcript = test_dict.pop("transcript")
     external_json = test_dict.get("external_json", {})
 
-    resp = {}
-    # post to nlprocessor
-    if nlp_models:
-        resp = submit_nlprocessor_transcript(transcript, nlp_models, external_json)
-        # store nlprocessor output into external_json object
-        external_json.update(resp)
-
-    # post to discovery
-    if intents:
-        resp = submit_discovery_transcript(transcript, intents, external_json)
+    try:
+        with case_context(
+            CaseInfo(
+                test_file, test_no, test_name, transcript, expected_intent(test_dict)
+            )
+        ):
+            resp = prefetcher(transcript, intents, nlp_models, external_json)
+    finally:
+        release(external_json)
 
     # Check if a valid response was received
     assert is_valid_response(resp), format_bad_response(
         "Invalid response", test_name, resp
     )
 
+    if "expected_outputs" in test_dict:
+        block_results = evaluate_block(test_dict, resp)
+        assert not any(
+            test_results.get("total_errors") for _, _, test_results in block_results
+        ), format_bad_block(test_name, block_results)
+        return
+
     # Check entity tests
     test_results = evaluate_entities_and_schema(test_dict, resp)
 
@@ -110,13 +233,48 @@ def setup(request):
     elif tests:
         check_discovery_setup(interpreter_directory, tests)
         target = identify_what_to_launch(tests)
-        launch_docker_compose(target, interpreter_directory)
+        use_running_services = request.config.getoption("--use-running-services")
+        reuse_services = request.config.getoption("--reuse-services")
+        if use_running_services:
+            wait_for_everything(LaunchTarget(target))
+        else:
+            launch_docker_compose(
+                target,
+                interpreter_directory,
+                reuse=reuse_services,
+                timings=request.config.getoption("--launch-timings"),
+            )
+        # running services may be anything, e.g. replay_server.py, so by default their
+        # responses are neither stored under the configured versions nor served from them
+        if not request.config.getoption("--no-cache") and (
+            not use_running_services or request.config.getoption("--response-cache")
+        ):
+            response_cache.open(interpreter_directory)
+        if request.config.getoption("--record-responses"):
+            response_store.path = request.config.getoption("--record-responses")
+            response_store.open()
+        concurrency = request.config.getoption("--concurrency")
+        if concurrency > 1:
+            prefetch_responses(
+                request.session.items,
+                request.config.getoption("--nlprocessor-concurrency") or concurrency,
+                request.config.getoption("--discovery-concurrency") or concurrency,
+            )
         LOGGER.info("running requested tests %s", tests)
         yield
 
         # teardown
-        LOGGER.info("shutting down docker services")
-        teardown_docker_compose()
+        prefetcher.shutdown()
+        response_cache.close()
+        response_store.close()
+        LOGGER.info("In-memory response cache: %s", memory_cache.stats())
+        memory_cache.clear()
+        if latency_recorder.timings:
+            latency_recorder.report()
+            latency_recorder.save()
+        if not (use_running_services or reuse_services):
+            LOGGER.info("shutting down docker services")
+            teardown_docker_compose()
     elif interpreter_directory:
         LOGGER.info("Validating interpreter_directory %s", interpreter_directory)
         yield
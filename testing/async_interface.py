@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+asyncio counterparts of the Discovery and NLProcessor interfaces.
+
+Payloads are built by the same functions as the synchronous path,
+so a transcript produces a byte-identical request either way.
+"""
+
+import asyncio
+import logging
+from collections import deque
+
+import aiohttp
+
+from testing.discovery_interface import (
+    DEVELOPER_URL,
+    DISCOVERY_URL,
+    make_discovery_payload,
+)
+from testing.http_client import POOL_SIZE, REQUEST_TIMEOUT
+from testing.nlprocessor_interface import NLPROCESSOR_URL, make_nlprocessor_payload
+
+LOGGER = logging.getLogger(__name__)
+
+
+class AsyncClient:
+    """
+    Keeps at most `concurrency` requests in flight over one pooled aiohttp session.
+
+    async with AsyncClient(concurrency=64) as client:
+        resp = await client.submit_discovery_transcript("dial eight", ["digit"])
+    """
+
+    def __init__(self, concurrency=POOL_SIZE, timeout=REQUEST_TIMEOUT):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.session = None
+        self.semaphore = None
+
+    async def __aenter__(self):
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    async def submit_payload(self, address, payload):
+        """
+        POST a prepared payload.
+        Returns an empty response when the request fails or times out.
+        """
+        async with self.semaphore:
+            try:
+                async with self.session.post(address, json=payload) as response:
+                    if not response.status == 200:
+                        LOGGER.error(
+                            "Request was not successful. Response Status Code: {}".format(
+                                response.status
+                            )
+                        )
+                        return {}
+                    return await response.json(content_type=None)
+            except asyncio.TimeoutError:
+                LOGGER.error(
+                    "Request to %s timed out after %s seconds", address, self.timeout
+                )
+                return {}
+
+    async def submit_discovery_transcript(
+        self, transcript, intents, external_json=None
+    ):
+        """
+        Submits a transcript to Discovery
+        :param transcript: str,
+        :param intents: list of intent labels
+        """
+        payload = make_discovery_payload(transcript, intents, external_json)
+        return await self.submit_payload(DISCOVERY_URL, payload)
+
+    async def submit_nlprocessor_transcript(
+        self, transcript, nlp_models, external_json=None
+    ):
+        """
+        Submits a transcript to NLProcessor
+        :param transcript: str,
+        :param nlp_models: list of ner and ic models
+        """
+        if not nlp_models:
+            return {}
+        payload = make_nlprocessor_payload(transcript, nlp_models, external_json)
+        return await self.submit_payload(NLPROCESSOR_URL, payload)
+
+    async def get_discovery_config(self):
+        "query developer route and get intents if available"
+        async with self.semaphore:
+            async with self.session.get(DEVELOPER_URL) as response:
+                return await response.json(content_type=None)
+
+    async def reload_discovery_config(self):
+        "POST to developer route to reload config"
+        async with self.semaphore:
+            async with self.session.post(DEVELOPER_URL, json={}) as response:
+                payload = await response.json(content_type=None)
+        return "result" in payload and payload["result"] == "success"
+
+    async def replay(self, func, requests, window=None):
+        """
+        Await func(*args) for every tuple of args in requests, yielding results in request order.
+
+        requests is consumed lazily: at most `window` calls, by default twice the
+        concurrency, are started and not yet yielded, so memory stays bounded
+        however long the input is or however slow one call is.
+        func should go through this client, whose semaphore bounds the requests in flight.
+        A call that raised yields its exception instead of a result.
+
+        >>> async def double(x):
+        ...     return 2 * x
+        >>> async def collect():
+        ...     return [r async for r in AsyncClient(2).replay(double, ((i,) for i in range(5)))]
+        >>> asyncio.run(collect())
+        [0, 2, 4, 6, 8]
+        """
+        window = window or 2 * self.concurrency
+        started = deque()
+
+        async def call(args):
+            try:
+                return await func(*args)
+            except Exception as exc:
+                return exc
+
+        try:
+            for args in requests:
+                if len(started) >= window:
+                    yield await started.popleft()
+                started.append(asyncio.ensure_future(call(args)))
+            while started:
+                yield await started.popleft()
+        finally:
+            for task in started:
+                task.cancel()
+            await asyncio.gather(*started, return_exceptions=True)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Parsed test corpora kept in memory and on disk, so each test file is parsed once
+"""
+
+import logging
+import os
+import pickle
+import tempfile
+import threading
+from os.path import abspath
+from os.path import join as join_path
+
+import dotenv
+
+from testing.expectations import current_year
+from testing.external_json import ExternalJson
+from testing.fingerprint import canonical_digest, file_digest
+from testing.parse_tests import blocks_to_tests, load_test_blocks
+
+LOGGER = logging.getLogger(__name__)
+
+env = dotenv.dotenv_values("client.env")
+
+CORPUS_CACHE_DIR = env.get("CORPUS_CACHE_DIR") or ".sdk_cache/corpus"
+
+# bump when the parsed form of a test file changes
+CORPUS_FORMAT = 4
+
+
+def external_json_files(blocks):
+    """
+    External json files referenced by parsed test blocks
+    """
+    return sorted(
+        {
+            block["external_json"].path
+            for block in blocks
+            if isinstance(block.get("external_json"), ExternalJson)
+        }
+    )
+
+
+def file_signature(path, previous=None):
+    """
+    (mtime, size, content digest) of a file.
+    The digest of previous is reused while mtime and size are unchanged.
+    """
+    stat = os.stat(path)
+    if previous and tuple(previous[:2]) == (stat.st_mtime_ns, stat.st_size):
+        return tuple(previous)
+    return stat.st_mtime_ns, stat.st_size, file_digest(path)
+
+
+def is_current(sources):
+    """
+    Whether every file still has the content it had when its signature was taken
+    """
+    for path, signature in sources.items():
+        try:
+            if file_signature(path, signature)[2] != signature[2]:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+class CorpusCache:
+    """
+    Returns load_tests and load_test_blocks results for test files, parsing a file only when it
+    or an external json file it references has changed since it was last parsed.
+
+    Results are kept in memory for the rest of the process and pickled to directory
+    keyed by the test file's path, so later processes skip parsing as well.
+    Files are hashed only when their mtime or size changed.
+    Entries also expire with the year, which is compiled into date macros.
+    """
+
+    def __init__(self, directory=CORPUS_CACHE_DIR):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.loaded = {}
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, test_file):
+        return join_path(
+            self.directory, canonical_digest(abspath(test_file)) + ".pickle"
+        )
+
+    def read(self, test_file):
+        try:
+            with open(self.path(test_file), "rb") as fl:
+                entry = pickle.load(fl)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+        if entry.get("format") != CORPUS_FORMAT:
+            return None
+        return entry
+
+    def write(self, test_file, entry):
+        """
+        Atomically store an entry, ignoring failures since the cache is only a shortcut
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                dir=self.directory, suffix=".tmp", delete=False
+            ) as fl:
+                pickle.dump(entry, fl, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(fl.name, self.path(test_file))
+        except (OSError, pickle.PicklingError) as exc:
+            LOGGER.warning("Unable to cache parsed %s: %s", test_file, exc)
+
+    def parse(self, test_file):
+        """
+        Parse a test file, noting the signature of every file it was parsed from.
+        The external json files are taken from the parsed blocks,
+        so later loads only check signatures and never reread the test file.
+        """
+        # signed before parsing, so an edit made meanwhile is caught next time
+        sources = {test_file: file_signature(test_file)}
+        blocks = load_test_blocks(test_file)
+        for path in external_json_files(blocks[0]):
+            sources[path] = file_signature(path)
+        return {
+            "format": CORPUS_FORMAT,
+            # expectations are compiled with the date macro resolved
+            "year": current_year(),
+            "sources": sources,
+            "blocks": blocks,
+        }
+
+    def load_entry(self, test_file):
+        with self.lock:
+            entry = self.loaded.get(test_file) or self.read(test_file)
+            if (
+                entry is not None
+                and entry["year"] == current_year()
+                and is_current(entry["sources"])
+            ):
+                self.hits += 1
+            else:
+                self.misses += 1
+                entry = self.parse(test_file)
+                self.write(test_file, entry)
+            if "tests" not in entry:
+                # individual tests are derived in memory rather than stored twice
+                blocks, intents, nlp_models = entry["blocks"]
+                entry = {
+                    **entry,
+                    "tests": (blocks_to_tests(blocks), intents, nlp_models),
+                }
+            self.loaded[test_file] = entry
+            return entry
+
+    def load(self, test_file):
+        """
+        Same as load_tests(test_file), parsing only if the file is new or changed
+        """
+        return self.load_entry(test_file)["tests"]
+
+    def load_blocks(self, test_file):
+        """
+        Same as load_test_blocks(test_file), parsing only if the file is new or changed
+        """
+        return self.load_entry(test_file)["blocks"]
+
+
+corpus_cache = CorpusCache()
@@ -11,17 +11,18 @@ from os.path import join as join_path
 
 import docker
 import dotenv
-import requests
 from mock import patch
 from yamllint.cli import run as yamllint
 
-from testing.service_interface import prepare_payload
+from testing import http_client
+from testing.service_interface import prepare_payload, submit_payload
 
 LOGGER = logging.getLogger(__name__)
 
 env = dotenv.dotenv_values("client.env")
 
 DEVELOPER_URL = "{}:{}/developer".format(env["DISCOVERY_HOST"], env["DISCOVERY_PORT"])
+DISCOVERY_URL = "{}:{}/process".format(env["DISCOVERY_HOST"], env["DISCOVERY_PORT"])
 
 
 def check_yaml(yaml_dir):
@@ -56,9 +57,9 @@ def log_discovery():
     )
 
 
-def submit_discovery_transcript(transcript, intents, external_json=None):
+def make_discovery_payload(transcript, intents, external_json=None):
     """
-    Submits a transcript to Discovery
+    Build the payload Discovery expects for a transcript
     :param transcript: str,
     :param intents: list of intent labels
     """
@@ -67,17 +68,17 @@ def submit_discovery_transcript(transcript, intents, external_json=None):
         "intents": intents,
     }
 
-    payload = prepare_payload(payload, external_json)
-    address = ":".join([env["DISCOVERY_HOST"], env["DISCOVERY_PORT"]]) + "/process"
-    response = requests.post(address, json=payload)
-    if not response.status_code == 200:
-        LOGGER.error(
-            "Request was not successful. Response Status Code: {}".format(
-                response.status_code
-            )
-        )
-        return {}
-    return response.json()
+    return prepare_payload(payload, external_json)
+
+
+def submit_discovery_transcript(transcript, intents, external_json=None):
+    """
+    Submits a transcript to Discovery
+    :param transcript: str,
+    :param intents: list of intent labels
+    """
+    payload = make_discovery_payload(transcript, intents, external_json)
+    return submit_payload(DISCOVERY_URL, payload)
 
 
 def validate_interpreter_directory(interpreter_directory):
@@ -90,13 +91,13 @@ def validate_interpreter_directory(interpreter_directory):
 
 def get_discovery_config():
     "query developer route and get intents if available"
-    r = requests.get(DEVELOPER_URL)
+    r = http_client.get(DEVELOPER_URL)
     payload = json.loads(r.text)
     return payload
 
 
 def reload_discovery_config():
     "POST to developer route to reload config"
-    r = requests.post(DEVELOPER_URL, json={})
+    r = http_client.post(DEVELOPER_URL, {})
     payload = json.loads(r.text)
     return "result" in payload and payload["result"] == "success"
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Dispatch service requests for test cases ahead of the tests that need them
+"""
+
+import contextvars
+import threading
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from testing.fingerprint import canonical_digest
+
+
+class StagedPipeline:
+    """
+    Runs the nlprocessor and discovery stages on separate bounded worker pools.
+    While discovery handles one transcript, nlprocessor is already working on the next,
+    so each stage's throughput is limited only by its own workers.
+
+    >>> pipeline = StagedPipeline(
+    ...     lambda transcript, nlp_models, external_json: {"nlp": transcript.upper()},
+    ...     lambda transcript, intents, external_json: {**external_json, "intents": intents},
+    ... )
+    >>> pipeline.submit("buy", ["inquiry"], ["ner"], {}).result()
+    {'nlp': 'BUY', 'intents': ['inquiry']}
+    >>> pipeline.submit("buy", [], ["ner"], {}).result()
+    {'nlp': 'BUY'}
+    >>> pipeline.submit("buy", ["inquiry"], [], {}).result()
+    {'intents': ['inquiry']}
+    >>> pipeline.shutdown()
+    """
+
+    def __init__(
+        self,
+        submit_nlprocessor,
+        submit_discovery,
+        nlprocessor_workers=1,
+        discovery_workers=1,
+    ):
+        self.submit_nlprocessor = submit_nlprocessor
+        self.submit_discovery = submit_discovery
+        self.nlprocessor_pool = ThreadPoolExecutor(max_workers=nlprocessor_workers)
+        self.discovery_pool = ThreadPoolExecutor(max_workers=discovery_workers)
+        # requests queued or running on either pool, so shutdown can cancel queued ones
+        self.lock = threading.Lock()
+        self.pending = set()
+
+    def track(self, future):
+        with self.lock:
+            self.pending.add(future)
+        future.add_done_callback(self.untrack)
+        return future
+
+    def untrack(self, future):
+        with self.lock:
+            self.pending.discard(future)
+
+    def cancel_pending(self):
+        """
+        Cancel every request still queued; running requests can't be cancelled
+        """
+        with self.lock:
+            pending = list(self.pending)
+        for future in pending:
+            future.cancel()
+
+    def submit(self, transcript, intents, nlp_models, external_json):
+        """
+        Schedule a test case and return a future of its final response.
+        Both stages run in a copy of the caller's context, e.g. the current test.
+        """
+        context = contextvars.copy_context()
+        if not nlp_models:
+            return self.track(
+                self.discovery_pool.submit(
+                    context.run,
+                    self.submit_discovery,
+                    transcript,
+                    intents,
+                    external_json,
+                )
+            )
+
+        nlprocessor_future = self.track(
+            self.nlprocessor_pool.submit(
+                context.run,
+                self.submit_nlprocessor,
+                transcript,
+                nlp_models,
+                external_json,
+            )
+        )
+        if not intents:
+            return nlprocessor_future
+
+        final = Future()
+
+        def forward(discovery_future):
+            try:
+                final.set_result(discovery_future.result())
+            except Exception as exc:
+                final.set_exception(exc)
+
+        def to_discovery(nlprocessor_future):
+            if not final.set_running_or_notify_cancel():
+                return
+            try:
+                # merge nlprocessor output into a copy so shared external_json stays untouched
+                merged_json = {**external_json, **nlprocessor_future.result()}
+                discovery_future = self.track(
+                    self.discovery_pool.submit(
+                        context.run,
+                        self.submit_discovery,
+                        transcript,
+                        intents,
+                        merged_json,
+                    )
+                )
+            except Exception as exc:
+                final.set_exception(exc)
+                return
+            discovery_future.add_done_callback(forward)
+
+        def cancel_upstream(final):
+            if final.cancelled():
+                nlprocessor_future.cancel()
+
+        final.add_done_callback(cancel_upstream)
+        nlprocessor_future.add_done_callback(to_discovery)
+        return final
+
+    def shutdown(self):
+        """
+        Cancel queued requests and wait for running ones,
+        nlprocessor first since finishing it can queue more discovery requests
+        """
+        self.cancel_pending()
+        self.nlprocessor_pool.shutdown(wait=True)
+        self.cancel_pending()
+        self.discovery_pool.shutdown(wait=True)
+
+
+class Prefetcher:
+    """
+    Fires requests through a dispatcher as soon as the services are up.
+    Each test then only waits on the future already in flight for its arguments,
+    and the future is let go once every test that submitted it has collected it,
+    so finished responses are not held for the rest of the run.
+
+    >>> prefetcher = Prefetcher(lambda transcript, intents, nlp_models, external_json: {})
+    >>> pipeline = StagedPipeline(
+    ...     lambda transcript, nlp_models, external_json: {"nlp": transcript},
+    ...     lambda transcript, intents, external_json: external_json,
+    ... )
+    >>> prefetcher.start(pipeline)
+    >>> for args in [("a", ["x"], ["y"], {}), ("a", ["x"], ["y"], {})]:
+    ...     prefetcher.submit(*args)
+    >>> len(prefetcher.futures)
+    1
+    >>> prefetcher("a", ["x"], ["y"], {}), prefetcher("b", ["x"], ["y"], {})
+    ({'nlp': 'a'}, {})
+    >>> prefetcher.shutdown()
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.dispatcher = None
+        self.futures = {}
+        self.waiting = Counter()
+
+    def start(self, dispatcher):
+        """
+        Send requests through a dispatcher whose submit method returns a future
+        """
+        self.dispatcher = dispatcher
+
+    def submit(self, *args):
+        """
+        Dispatch a request unless the same arguments are already in flight
+        """
+        key = canonical_digest(args)
+        if key not in self.futures:
+            self.futures[key] = self.dispatcher.submit(*args)
+        self.waiting[key] += 1
+
+    def __call__(self, *args):
+        key = canonical_digest(args)
+        future = self.futures.get(key)
+        if future is None:
+            return self.func(*args)
+        self.waiting[key] -= 1
+        if self.waiting[key] <= 0:
+            del self.futures[key], self.waiting[key]
+        return future.result()
+
+    def shutdown(self):
+        """
+        Stop dispatching, dropping any requests no test waited on
+        """
+        for future in self.futures.values():
+            future.cancel()
+        if self.dispatcher is not None:
+            self.dispatcher.shutdown()
+            self.dispatcher = None
+        self.futures = {}
+        self.waiting = Counter()
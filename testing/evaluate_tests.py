@@ -2,11 +2,17 @@
 
 import json
 import logging
-from datetime import date
-
-from testing.format_tests import strip_extra_whitespace
-from testing.output_tests import print_errors
-from testing.schema_evaluation import test_schema
+import threading
+from collections import OrderedDict, defaultdict
+
+from testing.expectations import (
+    EntityEquals,
+    PredictedIntent,
+    SchemaSubset,
+    compile_expectations,
+)
+from testing.format_tests import collapse_spaces, strip_extra_whitespace
+from testing.schema_evaluation import build_key_index, test_schema
 
 LOGGER = logging.getLogger(__name__)
 # create filehandler just for test errors for ease of human review
@@ -106,17 +112,17 @@ def get_observed_values(resp):
     # get ents from first (and only) intent
     entities = resp["intents"][0].get("entities", []) if resp.get("intents") else []
 
-    observed_entity_dict = {}
     # add nlprocessor entities from formatted_entities
+    # each label's words are gathered in one pass and joined once, giving what
+    # appending every word with a space and stripping extra whitespace each time would
+    words = defaultdict(list)
     for entity in resp.get("formatted_entities", []):
         if entity.get("label", "") not in {"O", ""}:
             label = entity["label"].replace("B-", "").replace("I-", "")
-            observed_entity_dict[label] = strip_extra_whitespace(
-                observed_entity_dict.get(label, "") + " " + entity.get("word")
-            )
+            words[label].append(collapse_spaces(" " + entity.get("word")).rstrip())
 
     observed_entity_dict = {
-        **observed_entity_dict,
+        **{label: "".join(pieces).lstrip() for label, pieces in words.items()},
         **{
             # keep only the most likely hypothesis from Discovery -> first dict in list of dicts returned by Discovery
             ent["label"]: ent["matches"][0]["value"]
@@ -129,31 +135,100 @@ def get_observed_values(resp):
     return observed_entity_dict, observed_intents
 
 
-def check_entities(test_dict, resp, test_name, observed_entity_dict):
+class ResponseView:
+    """
+    Normalized forms of one response, each computed on first use
+    and shared by every expectation checked against the response
+    """
+
+    def __init__(self, resp):
+        self.resp = resp
+        self._stripped = None
+        self._observed_values = None
+        self._key_index = None
+
+    @property
+    def stripped(self):
+        """
+        The response with whitespace normalized in every string
+        """
+        if self._stripped is None:
+            self._stripped = strip_extra_whitespace(self.resp)
+        return self._stripped
+
+    @property
+    def key_index(self):
+        """
+        Where a schema test finds each key of the normalized response
+        """
+        if self._key_index is None:
+            self._key_index = build_key_index(self.stripped)
+        return self._key_index
+
+    @property
+    def observed_values(self):
+        """
+        Observed value of each entity label, and the predicted intents
+        """
+        if self._observed_values is None:
+            self._observed_values = get_observed_values(self.resp)
+        return self._observed_values
+
+
+# views of the most recent responses; tests of one transcript get the same response object
+MAX_RESPONSE_VIEWS = 32
+_views = OrderedDict()
+_views_lock = threading.Lock()
+
+
+def response_view(resp):
     """
-    Check entities against expected results
+    The view of a response, reused while the same response object is evaluated.
+    Entries hold their response so its id can't be reused while cached.
     """
+    with _views_lock:
+        entry = _views.get(id(resp))
+        if entry is not None and entry.resp is resp:
+            _views.move_to_end(id(resp))
+            return entry
+        view = _views[id(resp)] = ResponseView(resp)
+        while len(_views) > MAX_RESPONSE_VIEWS:
+            _views.popitem(last=False)
+        return view
+
+
+def check_expectations(expectations, view, test_name):
+    """
+    Check compiled expectations against a response view
+    """
+    observed_entity_dict, observed_intents = view.observed_values
     results = []
     total_errors = 0
-    # Loop through all entity tests
-    for label, value in test_dict.items():
-        entity_label, expected_entity_value, resp = map(
-            strip_extra_whitespace, [label, value, resp]
-        )
+    for expectation in expectations:
+        if isinstance(expectation, PredictedIntent):
+            total_errors += expectation.value not in observed_intents
+            continue
 
-        if entity_label == "schema":
+        if isinstance(expectation, SchemaSubset):
+            schema = expectation.schema
+            if schema is None:
+                schema = json.loads(expectation.value)
             errors, error_value = test_schema(
-                resp, json.loads(expected_entity_value), LOGGER, test_name=test_name
+                view.stripped,
+                schema,
+                LOGGER,
+                test_name=test_name,
+                index=view.key_index,
             )
-        elif entity_label == "predicted_intent":
-            continue
-        else:
+        elif isinstance(expectation, EntityEquals):
             errors, error_value = test_single_entity(
-                observed_entity_dict, entity_label, expected_entity_value, test_name
+                observed_entity_dict, expectation.label, expectation.value, test_name
             )
+        else:
+            continue
 
         results.append(
-            [errors, test_name, entity_label, expected_entity_value, error_value]
+            [errors, test_name, expectation.label, expectation.value, error_value]
         )
 
         total_errors += errors
@@ -164,43 +239,21 @@ def check_entities(test_dict, resp, test_name, observed_entity_dict):
     return test_failures, total_errors
 
 
-def check_intents(test_dict, observed_intents):
-    """
-    Check intents
-    """
-    total_errors = 0
-    if (
-        test_dict.get("predicted_intent")
-        and test_dict["predicted_intent"] not in observed_intents
-    ):
-        total_errors += 1
-    return total_errors
-
-
-def test_single_case(test_dict, resp, test_name=""):
+def test_single_case(expectations, resp, test_name=""):
     """
     Run a single test case and return the number of errors
 
-    :param test_dict: dict;
-        keys: str; name of entity
-        values: str; first occurrence of entity in transcript
-    :return: Tuple(bool, int, int, int)
-        first element: bool; 0 if tests pass, 1 if tests fails
-        total_errors: int; number of entities in test whose observed value (str) differs from expected
-        total_entities: int; sum of number of entities (including schema tests)
+    :param expectations: list of compiled expectations, see testing.expectations
+    :return: Dict
+        total_errors: int; number of expectations in test the response does not meet
+        observed_entity_dict: observed value of each entity label
+        observed_intents: predicted intents
+        test_failures: test name, label, expected and observed value of each failure
     """
-    total_errors = 0
-
-    observed_entity_dict, observed_intents = get_observed_values(resp)
-
-    new_errors = check_intents(test_dict, observed_intents)
-    total_errors += new_errors
-
-    test_failures, new_errors = check_entities(
-        test_dict, resp, test_name, observed_entity_dict
-    )
-    total_errors += new_errors
+    view = response_view(resp)
+    test_failures, total_errors = check_expectations(expectations, view, test_name)
 
+    observed_entity_dict, observed_intents = view.observed_values
     return dict(
         total_errors=total_errors,
         observed_entity_dict=observed_entity_dict,
@@ -209,23 +262,53 @@ def test_single_case(test_dict, resp, test_name=""):
     )
 
 
+def get_expectations(test_dict):
+    """
+    Expectations compiled when the test was loaded,
+    or compiled now from the test dict's expected outputs
+    """
+    if "expectations" in test_dict:
+        return test_dict["expectations"]
+    return compile_expectations(
+        [(k, v) for k, v in test_dict.items() if k != "expected_outputs"]
+    )
+
+
 def evaluate_entities_and_schema(test_dict, resp):
     """
     :param test_dict: Dict, single test case (line in test file)
     :param resp: Dict, jsonified requests.Response object returned from Discovery
-    :param intent: Int, index of intent to test
-    :return: 4-Tuple, see test_single_test_case
+    :return: Dict, see test_single_case
         for a given test, tests whether each entity in test is present in
             response entities dict and, if so, whether observed value matches expected value
     """
 
     test_name = test_dict.get("test", "Unnamed Test")
 
-    # Remove non-entity keys from test_dict, then pass to `test_single_case`
-    test_dict = {
-        k: v.replace("@CUR_2DIGIT_YEAR", str(date.today().year)[-2:])
-        for k, v in test_dict.items()
-        if k not in ["transcript", "intent", "test", "external_json"]
-    }
     # evaluate whether all expected entities (label/value) are found in observed entity dict returned fby Discovery
-    return test_single_case(test_dict, resp, test_name)
+    return test_single_case(get_expectations(test_dict), resp, test_name)
+
+
+def evaluate_block(test_block, resp):
+    """
+    Evaluate every expected output of a test block against a single response,
+    as evaluate_entities_and_schema would for each of the block's individual tests.
+
+    :param test_block: Dict, a test block from load_test_blocks
+    :param resp: Dict, jsonified requests.Response object returned from Discovery
+    :return: List of (label, expected value, result of test_single_case), one per expected output
+    """
+    test_name = test_block.get("test", "Unnamed Test")
+    expectations = test_block.get("expectations") or compile_expectations(
+        test_block["expected_outputs"]
+    )
+    return [
+        (
+            label,
+            value,
+            test_single_case([expectation], resp, test_name),
+        )
+        for (label, value), expectation in zip(
+            test_block["expected_outputs"], expectations
+        )
+    ]
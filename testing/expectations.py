@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Expected outputs of a test compiled once, when the corpus is loaded,
+so evaluating a response only has to compare
+"""
+
+import json
+from collections import namedtuple
+from datetime import date
+
+from testing.format_tests import strip_extra_whitespace
+
+# keys in expected outputs that are not checked against the response
+UNCHECKED_KEYS = ["transcript", "intent", "test", "external_json"]
+
+DATE_MACRO = "@CUR_2DIGIT_YEAR"
+
+# an entity label whose observed value must equal value
+EntityEquals = namedtuple("EntityEquals", ["label", "value"])
+# keys that must be found in the response with the values in schema
+SchemaSubset = namedtuple("SchemaSubset", ["label", "value", "schema"])
+# an intent that must be among the predicted intents
+PredictedIntent = namedtuple("PredictedIntent", ["label", "value"])
+
+
+def current_year():
+    """
+    Replacement for the date macro
+    """
+    return str(date.today().year)[-2:]
+
+
+def compile_expectation(label, value, year=None):
+    """
+    Turn one expected output into a matcher, or None if there is nothing to check
+
+    >>> compile_expectation("digits", " 1  8 ")
+    EntityEquals(label='digits', value='1 8')
+    >>> compile_expectation("schema", '{"year": "@CUR_2DIGIT_YEAR"}', year="24")
+    SchemaSubset(label='schema', value='{"year": "24"}', schema={'year': '24'})
+    >>> compile_expectation("intent", "digit") is None
+    True
+    """
+    # the label goes first: an external_json value would load its document to be tested
+    if label in UNCHECKED_KEYS or value is None or value == "":
+        return None
+    value = value.replace(DATE_MACRO, year or current_year())
+
+    if label == "predicted_intent":
+        return PredictedIntent(label, value)
+
+    label, value = strip_extra_whitespace(label), strip_extra_whitespace(value)
+    if label == "predicted_intent":
+        # only checked when the key is exactly predicted_intent
+        return None
+    if label == "schema":
+        try:
+            schema = json.loads(value)
+        except ValueError:
+            # reported when the test runs, as before
+            schema = None
+        return SchemaSubset(label, value, schema)
+    return EntityEquals(label, value)
+
+
+def compile_expectations(expected_outputs, year=None):
+    """
+    Compile each (label, value) expected output, keeping None in place of unchecked ones
+    """
+    year = year or current_year()
+    return [
+        compile_expectation(label, value, year) for label, value in expected_outputs
+    ]
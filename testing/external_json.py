@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Lazily loaded external_json documents shared by every test that names the same file
+"""
+
+import collections
+import hashlib
+import json
+import os
+import threading
+import weakref
+
+import orjson
+
+
+class Document:
+    """
+    A parsed external json file and the digest of the bytes it was parsed from
+    """
+
+    __slots__ = ("data", "digest", "__weakref__")
+
+    def __init__(self, data, digest):
+        self.data = data
+        self.digest = digest
+
+
+_lock = threading.Lock()
+# a document stays loaded while any ExternalJson holding it has not been released
+_documents = weakref.WeakValueDictionary()
+
+
+def load_document(path):
+    """
+    Parse a json file once for all references to it that are still in use
+    """
+    with _lock:
+        document = _documents.get(path)
+        if document is None:
+            with open(path, "rb") as fl:
+                raw = fl.read()
+            try:
+                data = orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                # e.g. NaN, which the standard library accepts
+                data = json.loads(raw)
+            document = _documents[path] = Document(
+                data, hashlib.sha256(raw).hexdigest()
+            )
+        return document
+
+
+class ExternalJson(collections.abc.Mapping):
+    """
+    Read-only reference to an external json file, parsed on first access.
+    References to the same file share one parsed document.
+
+    Every test case using a reference acquires it and releases it when done;
+    once all of them have, the reference lets go of the document,
+    which is freed when no other reference holds it and reloaded if used again.
+    Pickles as its path, so parsed corpora never store document contents.
+
+    >>> import tempfile
+    >>> path = tempfile.mkstemp(suffix=".json")[1]
+    >>> _ = open(path, "w").write('{"segments": [1]}')
+    >>> a, b = ExternalJson(path), ExternalJson(path)
+    >>> dict(a), a.document is b.document, {**a, "transcript": "x"}
+    ({'segments': [1]}, True, {'segments': [1], 'transcript': 'x'})
+    """
+
+    def __init__(self, path):
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"external_json file {path} not found")
+        self.path = os.path.abspath(path)
+        self.pending = 0
+        self._document = None
+
+    @property
+    def document(self):
+        document = self._document
+        if document is None:
+            document = self._document = load_document(self.path)
+        return document
+
+    def __getitem__(self, key):
+        return self.document.data[key]
+
+    def __iter__(self):
+        return iter(self.document.data)
+
+    def __len__(self):
+        return len(self.document.data)
+
+    def __repr__(self):
+        return f"ExternalJson({self.path!r})"
+
+    def __reduce__(self):
+        return ExternalJson, (self.path,)
+
+    def canonical_form(self):
+        """
+        Identify the document by path and content without serializing it
+        """
+        return {"external_json": self.path, "sha256": self.document.digest}
+
+    def acquire(self):
+        with _lock:
+            self.pending += 1
+
+    def release(self):
+        with _lock:
+            self.pending -= 1
+            if self.pending <= 0:
+                self.pending = 0
+                self._document = None
+
+
+def acquire(external_json):
+    """
+    Note a test case that will use external_json, if it is a reference
+    """
+    if isinstance(external_json, ExternalJson):
+        external_json.acquire()
+
+
+def release(external_json):
+    """
+    Note a test case done with external_json, if it is a reference
+    """
+    if isinstance(external_json, ExternalJson):
+        external_json.release()
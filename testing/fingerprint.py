@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Content fingerprints of payloads, files and interpreter directories
+"""
+
+import collections
+import glob
+import hashlib
+import os
+
+import orjson
+
+CHUNK_SIZE = 1 << 20
+
+
+def _serialize_default(obj):
+    """
+    Serialize the immutable types produced by freeze,
+    and objects that provide a compact canonical_form of themselves
+    """
+    if hasattr(obj, "canonical_form"):
+        return obj.canonical_form()
+    if isinstance(obj, collections.abc.Mapping):
+        return dict(obj)
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    raise TypeError("Unsupported type: %r" % type(obj).__name__)
+
+
+def canonical_bytes(obj):
+    """
+    Compact serialization with sorted keys, so equal objects give equal bytes
+
+    >>> canonical_bytes({"b": [1, 2], "a": {"d": 1, "c": (2,)}})
+    b'{"a":{"c":[2],"d":1},"b":[1,2]}'
+    """
+    return orjson.dumps(
+        obj,
+        default=_serialize_default,
+        option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
+    )
+
+
+def canonical_digest(obj):
+    """
+    sha256 of the canonical serialization of obj
+
+    >>> canonical_digest({"a": 1, "b": 2}) == canonical_digest({"b": 2, "a": 1})
+    True
+    """
+    return hashlib.sha256(canonical_bytes(obj)).hexdigest()
+
+
+def file_digest(path):
+    """
+    sha256 of a file's contents, read in chunks
+    """
+    sha = hashlib.sha256()
+    with open(path, "rb") as fl:
+        for chunk in iter(lambda: fl.read(CHUNK_SIZE), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def iter_directory_files(directory):
+    """
+    Yield (relative path, path) for every file launch copies from an interpreter directory:
+    all visible top level entries and everything beneath them
+    """
+    for entry in sorted(glob.glob(os.path.join(directory, "*"))):
+        if os.path.isfile(entry):
+            yield os.path.relpath(entry, directory), entry
+            continue
+        for root, dirs, files in os.walk(entry):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, directory), path
+
+
+def directory_manifest(directory):
+    """
+    Map each file's path relative to directory to its content digest
+    """
+    return {
+        relative_path: file_digest(path)
+        for relative_path, path in iter_directory_files(directory)
+    }
+
+
+def directory_digest(directory):
+    """
+    Digest of an interpreter directory's contents, or None without a directory
+    """
+    if not directory:
+        return None
+    return canonical_digest(directory_manifest(directory))
@@ -1,10 +1,22 @@
 #!/usr/bin/env python3
 
+import re
+
+SPACE_RUNS = re.compile(" {2,}")
+
+
+def collapse_spaces(input_string):
+    """
+    Replace every run of spaces with a single space
+
+    >>> collapse_spaces("a    b  c ")
+    'a b c '
+    """
+    return SPACE_RUNS.sub(" ", input_string)
+
 
 def remove_all_whitespace_from_string(input_string):
-    while "  " in input_string:
-        input_string = input_string.replace("  ", " ")
-    return input_string.strip()
+    return collapse_spaces(input_string).strip()
 
 
 def clean_list(input_list):
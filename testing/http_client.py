@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Shared, pooled HTTP sessions for talking to Discovery and NLProcessor
+"""
+
+import dotenv
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+env = dotenv.dotenv_values("client.env")
+
+REQUEST_TIMEOUT = float(env.get("REQUEST_TIMEOUT") or 30)
+POOL_SIZE = int(env.get("POOL_SIZE") or 10)
+
+
+class RetryRequest(Retry):
+    """
+    Custom retry class with max backoff set to TIMEOUT from client.env
+    """
+
+    BACKOFF_MAX = float(env["TIMEOUT"])
+
+
+def make_session(pool_size=POOL_SIZE, max_retries=0):
+    """
+    Create a keep-alive session whose connection pool holds pool_size connections.
+    Requests beyond the pool size wait for a free connection instead of opening new ones.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=2,
+        pool_maxsize=pool_size,
+        max_retries=max_retries,
+        pool_block=True,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def make_retrying_session(pool_size=POOL_SIZE):
+    """
+    Session that retries with backoff until a service is up, e.g. for /ping
+    """
+    retries = RetryRequest(
+        total=int(env["RETRIES"]),
+        backoff_factor=1.0,
+        status_forcelist=[500, 502, 503, 504],
+    )
+    return make_session(pool_size, max_retries=retries)
+
+
+_session = make_session()
+
+
+def configure_session(pool_size=POOL_SIZE):
+    """
+    Resize the shared connection pool, e.g. to the concurrency of a test run
+    """
+    global _session
+    _session.close()
+    _session = make_session(max(pool_size, 1))
+    return _session
+
+
+def get(address, timeout=REQUEST_TIMEOUT, **kwargs):
+    """
+    GET through the shared session with a per-request timeout
+    """
+    return _session.get(address, timeout=timeout, **kwargs)
+
+
+def post(address, payload, timeout=REQUEST_TIMEOUT, **kwargs):
+    """
+    POST a json payload through the shared session with a per-request timeout
+    """
+    return _session.post(address, json=payload, timeout=timeout, **kwargs)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Per-request latency capture for nlprocessor and discovery, with percentile reports
+"""
+
+import contextlib
+import contextvars
+import functools
+import os
+import time
+from collections import defaultdict, namedtuple
+
+from testing.metrics import percentile, std_float
+from testing.output_tests import TABLE_BAR_LENGTH, json_dump, print_table
+
+# the test case a request is made for, propagated into worker threads by dispatch
+CaseInfo = namedtuple(
+    "CaseInfo", ["test_file", "test_no", "test_name", "transcript", "intent"]
+)
+current_case = contextvars.ContextVar("current_case", default=None)
+
+# intent group of requests made for tests that expect no particular intent
+NO_INTENT = "none"
+
+Timing = namedtuple(
+    "Timing",
+    [
+        "service",
+        "test_file",
+        "test_no",
+        "test_name",
+        "transcript",
+        "intent",
+        "time_dif_ms",
+    ],
+)
+
+PERCENTILES = (50, 90, 99)
+
+
+@contextlib.contextmanager
+def case_context(case_info):
+    """
+    Attribute requests made inside this block to case_info
+    """
+    token = current_case.set(case_info)
+    try:
+        yield
+    finally:
+        current_case.reset(token)
+
+
+def expected_intent(test_dict):
+    """
+    The intent a test, or any test of a test block, expects
+
+    >>> expected_intent({"intent": "digit"})
+    'digit'
+    >>> expected_intent({"expected_outputs": [("digits", "1")]})
+    'none'
+    """
+    if test_dict.get("intent"):
+        return test_dict["intent"]
+    for label, value in test_dict.get("expected_outputs", []):
+        if label == "intent" and value:
+            return value
+    return NO_INTENT
+
+
+def summarize(times_ms):
+    """
+    p50/p90/p99/max of a list of latencies in milliseconds
+
+    >>> summarize([10.0, 20.0, 30.0, 40.0])
+    {'count': 4, 'p50': 20.0, 'p90': 40.0, 'p99': 40.0, 'max': 40.0}
+    """
+    summary = {"count": len(times_ms)}
+    for q in PERCENTILES:
+        summary[f"p{q}"] = std_float(percentile(times_ms, q))
+    summary["max"] = std_float(max(times_ms, default=0))
+    return summary
+
+
+def summarize_by(timings, field):
+    """
+    Latency summaries per service and per value of a Timing field
+    """
+    groups = defaultdict(list)
+    for timing in timings:
+        groups[(timing.service, getattr(timing, field))].append(timing.time_dif_ms)
+    return {
+        service: {
+            value: summarize(times)
+            for (group_service, value), times in sorted(groups.items())
+            if group_service == service
+        }
+        for service in sorted({service for service, _ in groups})
+    }
+
+
+class LatencyRecorder:
+    """
+    Times every request a wrapped submit function makes with a monotonic clock
+    """
+
+    def __init__(self):
+        self.timings = []
+
+    def timed(self, service, submit):
+        """
+        Wrap submit(transcript, intents_or_models, ...) to record each call's latency
+        """
+
+        @functools.wraps(submit)
+        def wrapped(transcript, labels, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return submit(transcript, labels, *args, **kwargs)
+            finally:
+                self.record(service, transcript, time.perf_counter() - start)
+
+        return wrapped
+
+    def record(self, service, transcript, elapsed_sec):
+        """
+        Note a request's latency under the case it was made for
+        """
+        case = current_case.get() or CaseInfo("", 0, "", transcript, NO_INTENT)
+        self.timings.append(
+            Timing(
+                service=service,
+                test_file=case.test_file,
+                test_no=case.test_no,
+                test_name=case.test_name,
+                transcript=transcript,
+                intent=case.intent,
+                time_dif_ms=elapsed_sec * 1000,
+            )
+        )
+
+    def summary(self, timings=None):
+        """
+        Percentiles per service, overall, per test file and per expected intent
+        """
+        timings = self.timings if timings is None else timings
+        return {
+            "services": {
+                service: summarize(
+                    [t.time_dif_ms for t in timings if t.service == service]
+                )
+                for service in sorted({t.service for t in timings})
+            },
+            "test_files": summarize_by(timings, "test_file"),
+            "intents": summarize_by(timings, "intent"),
+        }
+
+    def report(self, top_n=5):
+        """
+        Print percentiles and the slowest requests of each service
+        """
+        summary = self.summary()
+        print(TABLE_BAR_LENGTH * "-")
+        print("\nLatency percentiles (ms):\n")
+        print(
+            "{:<15s}{:<60s}{:>8s}{:>10s}{:>10s}{:>10s}{:>10s}".format(
+                "service", "group", "count", "p50", "p90", "p99", "max"
+            )
+        )
+        for service, stats in summary["services"].items():
+            rows = [("all", stats)]
+            for grouping in ("test_files", "intents"):
+                rows += list(summary[grouping].get(service, {}).items())
+            for group, stats in rows:
+                print(
+                    "{:<15s}{:<60s}{:>8d}{:>10.2f}{:>10.2f}{:>10.2f}{:>10.2f}".format(
+                        service,
+                        str(group)[:59],
+                        stats["count"],
+                        stats["p50"],
+                        stats["p90"],
+                        stats["p99"],
+                        stats["max"],
+                    )
+                )
+
+        for service in summary["services"]:
+            print(f"\n{service}")
+            print_table([t for t in self.timings if t.service == service], top_n)
+
+    def save(self, directory="results"):
+        """
+        Write each test file's latencies next to its _results.json
+        """
+        os.makedirs(directory, exist_ok=True)
+        for test_file in sorted({t.test_file for t in self.timings if t.test_file}):
+            timings = [t for t in self.timings if t.test_file == test_file]
+            filename = test_file.split("/")[-1].replace(".txt", "_latency.json")
+            json_dump(
+                data={
+                    **self.summary(timings),
+                    "timings": [t._asdict() for t in timings],
+                },
+                outfile=filename,
+                directory=directory,
+            )
@@ -11,6 +11,23 @@ def std_float(number):
     return float("{:.2f}".format(number))
 
 
+def percentile(values, q):
+    """
+    Nearest-rank percentile of a list of numbers, 0 for an empty list
+    >>> percentile([5, 1, 4, 2, 3], 50)
+    3
+    >>> percentile([5, 1, 4, 2, 3], 99)
+    5
+    >>> percentile([], 90)
+    0
+    """
+    if not values:
+        return 0
+    ordered = sorted(values)
+    rank = max(int(-(-q * len(ordered) // 100)), 1)
+    return ordered[rank - 1]
+
+
 def normalize_confusion_matrix(matrix, imap, unique):
     sigma = [sum(matrix[imap[i]]) for i in unique]
     normalized_rows = []
@@ -11,16 +11,19 @@ from os.path import join as join_path
 
 import docker
 import dotenv
-import requests
 from mock import patch
 from yamllint.cli import run as yamllint
 
-from testing.service_interface import prepare_payload
+from testing.service_interface import prepare_payload, submit_payload
 
 LOGGER = logging.getLogger(__name__)
 
 env = dotenv.dotenv_values("client.env")
 
+NLPROCESSOR_URL = "{}:{}/process".format(
+    env["NLPROCESSOR_HOST"], env["NLPROCESSOR_PORT"]
+)
+
 
 def log_nlprocessor():
     """
@@ -36,28 +39,27 @@ def log_nlprocessor():
     )
 
 
-def submit_nlprocessor_transcript(transcript, nlp_models, external_json=None):
+def make_nlprocessor_payload(transcript, nlp_models, external_json=None):
     """
-    Submits a transcript to NLProcessor
+    Build the payload NLProcessor expects for a transcript
     :param transcript: str,
-    :param domain: str,
+    :param nlp_models: list of ner and ic models
     """
-    if not nlp_models:
-        return {}
     payload = {
         "transcript": transcript,
         "middlewareConfig": {"NLPROCESSOR": {"models": nlp_models}},
     }
 
-    payload = prepare_payload(payload, external_json)
+    return prepare_payload(payload, external_json)
+
 
-    address = ":".join([env["NLPROCESSOR_HOST"], env["NLPROCESSOR_PORT"]]) + "/process"
-    response = requests.post(address, json=payload)
-    if not response.status_code == 200:
-        LOGGER.error(
-            "Request was not successful. Response Status Code: {}".format(
-                response.status_code
-            )
-        )
+def submit_nlprocessor_transcript(transcript, nlp_models, external_json=None):
+    """
+    Submits a transcript to NLProcessor
+    :param transcript: str,
+    :param domain: str,
+    """
+    if not nlp_models:
         return {}
-    return response.json()
+    payload = make_nlprocessor_payload(transcript, nlp_models, external_json)
+    return submit_payload(NLPROCESSOR_URL, payload)
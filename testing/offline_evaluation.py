@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Grade test cases against responses recorded with --record-responses,
+without any service running
+"""
+
+import os
+import time
+from collections import namedtuple
+from multiprocessing import Pool
+
+from testing.discovery_interface import make_discovery_payload
+from testing.evaluate_tests import (
+    evaluate_entities_and_schema,
+    evaluate_intent,
+    format_intent_test_result,
+    is_valid_response,
+)
+from testing.metrics import divide_or_zero, std_float
+from testing.nlprocessor_interface import make_nlprocessor_payload
+from testing.response_cache import memoize
+from testing.response_store import payload_key
+
+# test cases graded per task handed to a worker process
+CHUNK_SIZE = 2000
+
+# entities_passed covers entity and schema expectations;
+# intents are None unless the test names an intent
+CaseResult = namedtuple(
+    "CaseResult",
+    ["passed", "entities_passed", "expected_intent", "observed_intent", "failures"],
+)
+
+
+def find_response(responses, transcript, intents, nlp_models, external_json):
+    """
+    The response submit_nlp_stack would have returned for a test case,
+    looked up in responses from load_responses; None if it was never recorded
+    """
+    resp = {}
+    if nlp_models:
+        resp = responses.get(
+            payload_key(
+                "nlprocessor",
+                make_nlprocessor_payload(transcript, nlp_models, external_json),
+            )
+        )
+        if resp is None:
+            return None
+        external_json = {**external_json, **resp}
+
+    if intents:
+        resp = responses.get(
+            payload_key(
+                "discovery", make_discovery_payload(transcript, intents, external_json)
+            )
+        )
+    return resp
+
+
+def response_finder(responses):
+    """
+    find_response for one store, looking each distinct request up once
+    """
+    return memoize(
+        lambda transcript, intents, nlp_models, external_json: find_response(
+            responses, transcript, intents, nlp_models, external_json
+        )
+    )
+
+
+def evaluate_case(test_dict, resp):
+    """
+    Grade one test case as test_nlp_stack would, also checking its intent if it names one.
+    A missing or failed response fails the case.
+
+    >>> evaluate_case({"test": "t", "transcript": "one", "digits": "1"}, None).failures
+    [['t', 'response', 'a recorded response', 'none']]
+    """
+    test_name = test_dict.get("test", "Unnamed Test")
+    expected_intent = test_dict.get("intent")
+    if resp is None or not is_valid_response(resp):
+        failure = (
+            [test_name, "response", "a recorded response", "none"]
+            if resp is None
+            else [test_name, "response", "a valid response", str(resp)]
+        )
+        return CaseResult(
+            False, False, expected_intent, "" if expected_intent else None, [failure]
+        )
+
+    test_results = evaluate_entities_and_schema(test_dict, resp)
+    entities_passed = not test_results["total_errors"]
+    failures = [[str(field) for field in f] for f in test_results["test_failures"]]
+
+    observed_intent = None
+    if expected_intent:
+        if resp.get("intents"):
+            expected_intent, observed_intent = evaluate_intent(
+                test_dict, resp, test_name
+            )
+        else:
+            observed_intent = ""
+        intent_result = format_intent_test_result(
+            test_name, expected_intent, observed_intent
+        )
+        if intent_result["test_failures"]:
+            failures.append(intent_result["test_failures"])
+
+    return CaseResult(
+        entities_passed and expected_intent == observed_intent,
+        entities_passed,
+        expected_intent,
+        observed_intent,
+        failures,
+    )
+
+
+def evaluate_chunk(chunk):
+    """
+    Grade (test_dict, response) pairs, returning their results and the seconds taken.
+    Tests sharing a response within a chunk share its normalized forms.
+    """
+    start = time.perf_counter()
+    results = [evaluate_case(test_dict, resp) for test_dict, resp in chunk]
+    return results, time.perf_counter() - start
+
+
+def iter_chunks(pairs, chunk_size=CHUNK_SIZE):
+    """
+    Split a file's (test_dict, response) pairs into consecutive chunks
+
+    >>> [len(chunk) for chunk in iter_chunks(list(range(5)), 2)]
+    [2, 2, 1]
+    """
+    for start in range(0, len(pairs), chunk_size):
+        yield pairs[start : start + chunk_size]
+
+
+def evaluate_files(pairs_by_file, processes=None, chunk_size=CHUNK_SIZE):
+    """
+    Grade the pairs of every test file, in worker processes unless processes,
+    by default the number of cpus, is 1.
+    Returns each file's case results and the seconds spent grading them.
+    """
+    processes = processes or os.cpu_count() or 1
+    tasks = [
+        (test_file, chunk)
+        for test_file, pairs in pairs_by_file.items()
+        for chunk in iter_chunks(pairs, chunk_size)
+    ]
+    chunks = [chunk for _, chunk in tasks]
+    if processes <= 1 or len(chunks) <= 1:
+        graded = map(evaluate_chunk, chunks)
+    else:
+        with Pool(processes) as pool:
+            graded = pool.map(evaluate_chunk, chunks, chunksize=1)
+
+    results = {test_file: [] for test_file in pairs_by_file}
+    seconds = dict.fromkeys(pairs_by_file, 0.0)
+    for (test_file, _), (chunk_results, chunk_seconds) in zip(tasks, graded):
+        results[test_file].extend(chunk_results)
+        seconds[test_file] += chunk_seconds
+    return {
+        test_file: (results[test_file], seconds[test_file])
+        for test_file in pairs_by_file
+    }
+
+
+def summarize_results(test_file, results, seconds):
+    """
+    Build the output_dict record_results expects from a file's case results
+    """
+    intent_results = [r for r in results if r.expected_intent is not None]
+    entity_results = [r for r in results if r.expected_intent is None]
+    return dict(
+        test_file=test_file,
+        entity_accuracy=divide_or_zero(
+            sum(r.entities_passed for r in entity_results), len(entity_results)
+        ),
+        expected_intents=[r.expected_intent for r in intent_results],
+        observed_intents=[r.observed_intent for r in intent_results],
+        correct_tests=sum(r.passed for r in results),
+        total_tests=len(results),
+        test_time_sec=std_float(seconds),
+        test_failures=[failure for r in results for failure in r.failures],
+    )
@@ -2,10 +2,14 @@
 
 import glob
 import itertools
-import json
 from os.path import dirname
 from os.path import join as join_path
 
+from testing.expectations import compile_expectations, current_year
+from testing.external_json import ExternalJson
+
+NLP_MODEL_WHITELISTS = ("ner_models", "ic_models")
+
 
 def expand_wildcard_tests(tests):
     """
@@ -28,29 +32,51 @@ def expand_wildcard_tests(tests):
     return tests
 
 
-def load_test_file(test_file):
-    return [_.strip() for _ in open(test_file) if _.strip() and not _.startswith("#")]
+def iter_test_file(test_file):
+    """
+    Yield the stripped lines of a test file, skipping blank lines and comments
+    """
+    with open(test_file) as fl:
+        for line in fl:
+            stripped = line.strip()
+            if stripped and not line.startswith("#"):
+                yield stripped
 
 
-def make_test_list(test_list, test_folder):
+def iter_test_sets(test_lines, test_folder, whitelists=None):
     """
-    Creates a dictionary definition the inputs and expected outputs of a tests into a list
-    under the key expected_outputs
+    Yield a dictionary defining the inputs and expected outputs of each test,
+    the latter as a list under the key expected_outputs, as soon as its lines are read.
+    Whitelists found along the way are added to the whitelists dictionary.
+
+    >>> whitelists = {}
+    >>> lines = ["intent_whitelist: digit", "test: one", "transcript: one", "digits: 1"]
+    >>> list(iter_test_sets(lines, ".", whitelists)), whitelists
+    ([{'test': 'one', 'transcript': 'one', 'expected_outputs': [('digits', '1')]}], {'intents': ['digit']})
     """
-    split_inds = [i for i, val in enumerate(test_list) if val.split(": ")[0] == "test"]
-    split_list = [
-        test_list[start:stop]
-        for start, stop in zip(split_inds, split_inds[1:] + [len(test_list)])
-    ]
-    test_def_dicts = []
-    for test in split_list:
-        t_dict = {}
-        for line in test:
+    whitelists = {} if whitelists is None else whitelists
+    t_dict = None
+    for line in test_lines:
+        if "intents" in whitelists:
+            if line in whitelists["intents"]:
+                continue
+        elif line.startswith("intent"):
+            whitelists["intents"] = format_whitelist(line)
+
+        for key in NLP_MODEL_WHITELISTS:
+            if key not in whitelists and line.startswith(key):
+                whitelists[key] = format_whitelist(line)
+
+        if line.split(": ")[0] == "test":
+            if t_dict is not None:
+                yield t_dict
+            t_dict = {}
+        if t_dict is not None:
             # Update t_dict with information from each line
             t_dict = process_line(t_dict, line, test_folder)
-        test_def_dicts += [t_dict]
 
-    return test_def_dicts
+    if t_dict is not None:
+        yield t_dict
 
 
 def process_line(t_dict, line, test_folder):
@@ -77,62 +103,103 @@ def parse_test_line(ret_dict, key, value, test_folder):
         ]
     elif key == "external_json":
         ent_file = join_path(test_folder, "external_json", value)
-        ret_dict[key] = json.load(open(ent_file, "r"))
+        # parsed on first use and shared with every other test naming the file
+        ret_dict[key] = ExternalJson(ent_file)
     else:
         # Unique keys (per test set) that are test definition parameters usually
         ret_dict[key] = value
     return ret_dict
 
 
-def create_individual_tests(test_set):
+def create_individual_tests(test_set, year=None):
     """
     Creates test definitions from a test set as dictionaries.
     Assumes 'expected_outputs' is a list of tuples defining expected outputs key value pairs
       [('schema', [SCHEMA-DICT]), ...]
-    """
-
-    test_inputs = {k: v for k, v in test_set.items() if k != "expected_outputs"}
+    Each test also holds its expected output compiled under 'expectations'.
+    """
+
+    test_inputs = {
+        k: v
+        for k, v in test_set.items()
+        if k not in ["expected_outputs", "expectations"]
+    }
+    expected_outputs = test_set.get("expected_outputs", [(None, None)])
+    expectations = test_set.get("expectations") or compile_expectations(
+        expected_outputs, year
+    )
     test_dicts = [
-        {k: v, **test_inputs}
-        for k, v in test_set.get("expected_outputs", [(None, None)])
+        {k: v, **test_inputs, "expectations": [expectation]}
+        for (k, v), expectation in zip(expected_outputs, expectations)
         if v
     ]
     return test_dicts
 
 
-def load_tests(test_file):
+def create_test_block(test_set, year=None):
     """
-    Loads and parses the test file
+    Keep a test set whole as a single test of all its expected outputs,
+    leaving out the ones create_individual_tests would skip.
+    Returns None if no expected outputs are left.
     """
-    test_list = load_test_file(test_file)
-    test_list, intents, nlp_models = find_whitelists(test_list)
-    test_directory = dirname(test_file)
-    test_def_list = make_test_list(test_list, test_directory)
+    expected_outputs = [(k, v) for k, v in test_set.get("expected_outputs", []) if v]
+    if not expected_outputs:
+        return None
+    return {
+        **test_set,
+        "expected_outputs": expected_outputs,
+        "expectations": compile_expectations(expected_outputs, year),
+    }
 
-    tests = [create_individual_tests(test_set) for test_set in test_def_list]
-    tests = list(itertools.chain.from_iterable(tests))
 
-    return tests, intents, nlp_models
+def blocks_to_tests(test_blocks):
+    """
+    Split test blocks into the individual tests load_tests returns
+    """
+    return list(
+        itertools.chain.from_iterable(map(create_individual_tests, test_blocks))
+    )
 
 
-def find_whitelists(test_file):
+def iter_tests(test_file, whitelists=None):
     """
-    If testfile starts with any whitelists, separate them from the test file.
+    Parse a test file in a single pass, yielding each individual test as it is read.
+    The file's whitelists are added to the whitelists dictionary as they are found,
+    which for a well-formed file is before the first test.
     """
+    test_sets = iter_test_sets(
+        iter_test_file(test_file), dirname(test_file), whitelists
+    )
+    year = current_year()
+    for test_set in test_sets:
+        yield from create_individual_tests(test_set, year)
 
-    intents = [intent for intent in test_file if intent.startswith("intent")]
-    intents = format_whitelist(intents[0]) if intents else []
 
-    ner_models = [line for line in test_file if line.startswith("ner_models")]
-    ner_models = format_whitelist(ner_models[0]) if ner_models else []
-    ic_models = [line for line in test_file if line.startswith("ic_models")]
-    ic_models = format_whitelist(ic_models[0]) if ic_models else []
+def load_tests(test_file):
+    """
+    Loads and parses the test file
+    """
+    whitelists = {}
+    tests = list(iter_tests(test_file, whitelists))
+    return tests, whitelists.get("intents", []), whitelist_nlp_models(whitelists)
+
 
-    nlp_models = ner_models + ic_models
+def load_test_blocks(test_file):
+    """
+    Loads and parses the test file into one test per block of expected outputs
+    """
+    whitelists = {}
+    test_sets = iter_test_sets(
+        iter_test_file(test_file), dirname(test_file), whitelists
+    )
+    year = current_year()
+    blocks = [create_test_block(test_set, year) for test_set in test_sets]
+    blocks = [block for block in blocks if block]
+    return blocks, whitelists.get("intents", []), whitelist_nlp_models(whitelists)
 
-    test_file = [line for line in test_file if not line in intents]
 
-    return test_file, intents, nlp_models
+def whitelist_nlp_models(whitelists):
+    return [model for key in NLP_MODEL_WHITELISTS for model in whitelists.get(key, [])]
 
 
 def format_whitelist(line):
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Response caches that let test runs skip requests whose answer is already known
+"""
+
+import functools
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import dotenv
+import orjson
+
+from testing.fingerprint import canonical_digest, directory_digest
+from testing.single_flight import SingleFlight
+
+LOGGER = logging.getLogger(__name__)
+
+env = dotenv.dotenv_values("client.env")
+
+RESPONSE_CACHE_DIR = env.get("RESPONSE_CACHE_DIR") or ".sdk_cache/responses"
+RESPONSE_CACHE_MAX_MB = float(env.get("RESPONSE_CACHE_MAX_MB") or 512)
+RESPONSE_MEMORY_CACHE_MB = float(env.get("RESPONSE_MEMORY_CACHE_MB") or 256)
+
+_MISSING = object()
+
+# eviction trims the cache to this share of its budget, so it doesn't run on every store
+EVICT_TO = 0.9
+
+
+def is_cacheable(resp):
+    """
+    Only successful responses are kept; failures should be requested again
+
+    >>> is_cacheable({"intents": []}), is_cacheable({"result": "failure"}), is_cacheable({})
+    (True, False, False)
+    """
+    return bool(resp) and resp.get("result") != "failure"
+
+
+def service_versions(interpreter_directory=None):
+    """
+    Everything besides the payload that determines a service's response:
+    the image tags from client.env and, for discovery, the custom interpreter
+    """
+    return {
+        "nlprocessor": {
+            "NLPROCESSOR_TAG": env["NLPROCESSOR_TAG"],
+            "INIT_NLPROCESSOR_TAG": env["INIT_NLPROCESSOR_TAG"],
+        },
+        "discovery": {
+            "DISCOVERY_TAG": env["DISCOVERY_TAG"],
+            "INIT_DISCOVERY_TAG": env["INIT_DISCOVERY_TAG"],
+            "interpreter": directory_digest(interpreter_directory),
+        },
+    }
+
+
+class DiskCache:
+    """
+    Content-addressed response cache persisted between runs.
+
+    Successful responses are stored one file per key and the least recently used files
+    are evicted as soon as the directory outgrows max_bytes.
+    The cache is inert until opened, so wrapped functions behave as before.
+
+    >>> cache = DiskCache(tempfile.mkdtemp(), max_bytes=1 << 20)
+    >>> submit = cache.wrap("discovery", lambda t: {"echo": t}, lambda t: {"transcript": t})
+    >>> cache.open()
+    >>> submit("one"), submit("one"), cache.hits, cache.misses
+    ({'echo': 'one'}, {'echo': 'one'}, 1, 1)
+    """
+
+    def __init__(
+        self,
+        directory=RESPONSE_CACHE_DIR,
+        max_bytes=int(RESPONSE_CACHE_MAX_MB * 1024 * 1024),
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.versions = None
+        self.lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.versions is not None
+
+    def open(self, interpreter_directory=None):
+        """
+        Start caching responses for the services as currently configured
+        """
+        self.versions = service_versions(interpreter_directory)
+        os.makedirs(self.directory, exist_ok=True)
+        # trims a cache left oversized, e.g. by a smaller budget, and counts its size
+        self.evict()
+
+    def close(self):
+        """
+        Stop caching
+        """
+        if self.enabled:
+            LOGGER.info("Response cache: %d hits, %d misses", self.hits, self.misses)
+        self.versions = None
+
+    def key(self, service, payload):
+        return canonical_digest([service, self.versions[service], payload])
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key):
+        """
+        Return the stored response or None, marking the entry as recently used
+        """
+        path = self.path(key)
+        try:
+            with open(path, "rb") as fl:
+                resp = orjson.loads(fl.read())
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return resp
+
+    def put(self, key, resp):
+        """
+        Atomically store a response so concurrent writers never leave partial files,
+        evicting old entries if the cache outgrows its budget
+        """
+        path = self.path(key)
+        data = orjson.dumps(resp)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(path), suffix=".tmp", delete=False
+        ) as fl:
+            fl.write(data)
+        os.replace(fl.name, path)
+        with self.lock:
+            self.bytes += len(data)
+            oversized = self.bytes > self.max_bytes
+        if oversized:
+            self.evict(int(self.max_bytes * EVICT_TO))
+
+    def evict(self, target_bytes=None):
+        """
+        Delete least recently used entries until the cache fits in target_bytes,
+        by default max_bytes. Returns the number of entries removed.
+        """
+        target_bytes = self.max_bytes if target_bytes is None else target_bytes
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= target_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+
+        with self.lock:
+            self.bytes = total
+        if removed:
+            LOGGER.info("Evicted %d cached responses", removed)
+        return removed
+
+    def wrap(self, service, submit, make_payload):
+        """
+        Serve submit's responses from the cache, keyed by the payload make_payload
+        builds from the same arguments. Empty and failed responses are never stored.
+        """
+
+        @functools.wraps(submit)
+        def wrapped(*args, **kwargs):
+            if not self.enabled:
+                return submit(*args, **kwargs)
+
+            key = self.key(service, make_payload(*args, **kwargs))
+            resp = self.get(key)
+            # failures stored by older versions are requested again too
+            if resp is not None and is_cacheable(resp):
+                self.hits += 1
+                return resp
+
+            self.misses += 1
+            resp = submit(*args, **kwargs)
+            if is_cacheable(resp):
+                self.put(key, resp)
+            return resp
+
+        return wrapped
+
+
+class MemoryCache:
+    """
+    Thread-safe in-process LRU cache bounded by the serialized size of its values.
+
+    Sizes are measured as JSON bytes, which tracks the memory a response holds
+    closely enough to keep a long run under a fixed ceiling.
+    A value larger than the whole budget is not stored at all.
+
+    >>> cache = MemoryCache(max_bytes=30)
+    >>> cache["a"], cache["b"] = {"echo": "a"}, {"echo": "b"}
+    >>> cache.get("a"), cache.get("c")
+    ({'echo': 'a'}, None)
+    >>> cache["c"] = {"echo": "c"}
+    >>> "b" in cache, cache.stats()
+    (False, {'entries': 2, 'bytes': 24, 'hits': 1, 'misses': 1, 'evictions': 1})
+    """
+
+    def __init__(self, max_bytes=int(RESPONSE_MEMORY_CACHE_MB * 1024 * 1024)):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        """
+        Return the cached value, marking it as most recently used
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def peek(self, key, default=None):
+        """
+        Return the cached value without counting a lookup or marking it as used
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            return default if entry is None else entry[0]
+
+    def __setitem__(self, key, value):
+        size = len(orjson.dumps(value))
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self.entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def memoize(func, cache=None, namespace=None):
+    """
+    Cache func's results under a canonical digest of namespace and its arguments.
+    The arguments themselves are passed through untouched, so nothing is frozen or copied,
+    and concurrent calls with equal arguments share one call in flight.
+
+    >>> calls = []
+    >>> submit = memoize(lambda transcript, external_json: calls.append(transcript) or {})
+    >>> submit("a", {"segments": [1]}), submit("a", {"segments": [1]}), calls
+    ({}, {}, ['a'])
+
+    cache may be any mapping with get and item assignment, such as a MemoryCache;
+    entries it evicts are simply requested again.
+    Functions sharing a cache need distinct namespaces, e.g. their service,
+    unless equal arguments really do give them equal results.
+    Each call is counted as one cache lookup.
+    """
+    cache = {} if cache is None else cache
+    peek = getattr(cache, "peek", cache.get)
+    flight = SingleFlight()
+
+    def call(key, *args, **kwargs):
+        # another caller may have finished while this one was waiting to lead;
+        # its lookup was already counted
+        result = peek(key, _MISSING)
+        if result is not _MISSING:
+            return result
+        result = func(*args, **kwargs)
+        cache[key] = result
+        return result
+
+    @functools.wraps(func)
+    def wrapped(*args, **kwargs):
+        key = canonical_digest([namespace, args, kwargs])
+        result = cache.get(key, _MISSING)
+        if result is not _MISSING:
+            return result
+        return flight.do(key, call, key, *args, **kwargs)
+
+    wrapped.cache = cache
+    return wrapped
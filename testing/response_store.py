@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+JSON lines store of raw service responses, keyed by a digest of the payload that produced them
+"""
+
+import functools
+import threading
+
+import orjson
+
+from testing.fingerprint import canonical_digest
+
+
+def payload_key(service, payload):
+    """
+    Identify a request by service and canonical payload digest
+
+    >>> payload_key("discovery", {"transcript": "a", "intents": ["b"]})[0]
+    'discovery'
+    """
+    return service, canonical_digest(payload)
+
+
+class ResponseStore:
+    """
+    Appends each response a wrapped submit function receives to a .jsonl file.
+    Every line holds the service, the payload digest, the transcript and the response.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.fl = None
+
+    def open(self):
+        self.fl = open(self.path, "ab")
+
+    def close(self):
+        if self.fl is not None:
+            self.fl.close()
+            self.fl = None
+
+    def record(self, service, payload, resp):
+        line = orjson.dumps(
+            {
+                "service": service,
+                "digest": canonical_digest(payload),
+                "transcript": payload.get("transcript", ""),
+                "intents": payload.get("intents", []),
+                "response": resp,
+            }
+        )
+        with self.lock:
+            self.fl.write(line + b"\n")
+
+    def wrap(self, service, submit, make_payload):
+        """
+        Record submit's responses along with the payload make_payload builds
+        from the same arguments. Empty responses are not recorded.
+        """
+
+        @functools.wraps(submit)
+        def wrapped(*args, **kwargs):
+            resp = submit(*args, **kwargs)
+            if self.fl is not None and resp:
+                self.record(service, make_payload(*args, **kwargs), resp)
+            return resp
+
+        return wrapped
+
+
+def iter_records(path):
+    """
+    Yield every record of a response store
+    """
+    with open(path, "rb") as fl:
+        for line in fl:
+            if line.strip():
+                yield orjson.loads(line)
+
+
+def load_responses(path):
+    """
+    Map (service, payload digest) to the response recorded for it.
+    When a payload was recorded more than once the last response wins.
+    """
+    return {
+        (record["service"], record["digest"]): record["response"]
+        for record in iter_records(path)
+    }
@@ -4,10 +4,16 @@
 Stores utilities around testing schema
 """
 
+import functools
 import json
+import re
 
 from testing.output_tests import print_errors
 
+# marks a schema test key as a path from the top of the response
+PATH_PREFIX = "$."
+PATH_STEP = re.compile(r"\.?([^.\[\]]+)|\[(\d+)\]|\[([^=\]]+)=([^\]]*)\]")
+
 
 def _find_in_list(obj, key):
     for list_item in obj:
@@ -32,6 +38,89 @@ def _find(obj, key):
         return _find_in_dict(obj, key)
 
 
+def build_key_index(obj):
+    """
+    Map every key to what _find(obj, key) returns, in a single walk of obj.
+    Keys _find would not find, or finds holding None, are left out.
+
+    >>> resp = {"intents": [{"entities": [{"label": "a"}], "label": "b"}], "x": {"label": "c"}}
+    >>> index = build_key_index(resp)
+    >>> all(index.get(k) == _find(resp, k) for k in ["label", "entities", "x", "y"])
+    True
+    """
+    if isinstance(obj, list):
+        index = {}
+        for item in obj:
+            for key, value in build_key_index(item).items():
+                index.setdefault(key, value)
+        return index
+    if isinstance(obj, dict):
+        # direct keys take precedence, even holding None, which hides the children's
+        index = {key: value for key, value in obj.items() if value is not None}
+        for child in obj.values():
+            for key, value in build_key_index(child).items():
+                if key not in obj:
+                    index.setdefault(key, value)
+        return index
+    return {}
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_path(path):
+    """
+    Split a path selector into steps: a key, a list index,
+    or the first list item with a field of the given value
+
+    >>> compile_path("$.intents[0].entities[label=room]")
+    (('key', 'intents'), ('index', 0), ('key', 'entities'), ('match', 'label', 'room'))
+    """
+    steps = []
+    position = len(PATH_PREFIX) - 1 if path.startswith(PATH_PREFIX) else 0
+    while position < len(path):
+        match = PATH_STEP.match(path, position)
+        if match is None:
+            raise ValueError(f"Invalid path {path!r} at {path[position:]!r}")
+        key, index, field, value = match.groups()
+        if key is not None:
+            steps.append(("key", key))
+        elif index is not None:
+            steps.append(("index", int(index)))
+        else:
+            steps.append(("match", field, value))
+        position = match.end()
+    return tuple(steps)
+
+
+def select_path(obj, path):
+    """
+    Follow a path selector from the top of obj, returning None if it leads nowhere
+
+    >>> resp = {"intents": [{"entities": [{"label": "a", "value": 1}, {"label": "b", "value": 2}]}]}
+    >>> select_path(resp, "$.intents[0].entities[label=b].value")
+    2
+    >>> select_path(resp, "$.intents[1]") is None
+    True
+    """
+    for step in compile_path(path):
+        if step[0] == "key":
+            obj = obj.get(step[1]) if isinstance(obj, dict) else None
+        elif step[0] == "index":
+            obj = obj[step[1]] if isinstance(obj, list) and step[1] < len(obj) else None
+        else:
+            _, field, value = step
+            obj = next(
+                (
+                    item
+                    for item in (obj if isinstance(obj, list) else [])
+                    if isinstance(item, dict) and str(item.get(field)) == value
+                ),
+                None,
+            )
+        if obj is None:
+            return None
+    return obj
+
+
 def is_invalid_schema(schema, test_value):
     """
     Checks schema against tests with dictionary nesting
@@ -80,22 +169,28 @@ def is_invalid_schema(schema, test_value):
     return schema != test_value
 
 
-def test_schema(resp, test_value, logger, test_name=""):
+def test_schema(resp, test_value, logger, test_name="", index=None):
     """
     For each key-value pair given in the schema test,
     recursively search the JSON response for the key,
-    then make sure the value is correct
+    then make sure the value is correct.
+    Keys starting with $. are paths from the top of the response instead.
+    A key index of the response from build_key_index saves searching it.
     """
 
+    def lookup(key):
+        if key.startswith(PATH_PREFIX):
+            return select_path(resp, key)
+        if index is not None:
+            return index.get(key)
+        return _find(resp, key)
+
     # Returning number of errors, so check for values that do not equal test case
     errs = {}
-    for res in map(
-        lambda k: {k: _find(resp, k)}
-        if is_invalid_schema(_find(resp, k), test_value[k])
-        else {},
-        list(test_value.keys()),
-    ):
-        errs.update(res)
+    for key, value in test_value.items():
+        observed = lookup(key)
+        if is_invalid_schema(observed, value):
+            errs[key] = observed
 
     print_errors(test_name, test_value, errs, logger)
 
@@ -1,8 +1,14 @@
 #!/usr/bin/env python3
 
+import logging
+
 import immutables
+import requests
 
 from freeze import unfreeze
+from testing import http_client
+
+LOGGER = logging.getLogger(__name__)
 
 
 def prepare_payload(payload, external_json):
@@ -19,3 +25,23 @@ def prepare_payload(payload, external_json):
             del payload["transcript"]
         payload = {**external_json, **payload}
     return payload
+
+
+def submit_payload(address, payload, timeout=http_client.REQUEST_TIMEOUT):
+    """
+    POST a prepared payload through the shared session.
+    Returns an empty response when the request fails or times out.
+    """
+    try:
+        response = http_client.post(address, payload, timeout=timeout)
+    except requests.exceptions.Timeout:
+        LOGGER.error("Request to %s timed out after %s seconds", address, timeout)
+        return {}
+    if not response.status_code == 200:
+        LOGGER.error(
+            "Request was not successful. Response Status Code: {}".format(
+                response.status_code
+            )
+        )
+        return {}
+    return response.json()
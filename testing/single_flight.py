@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Coalesce concurrent identical calls so only one of them does the work
+"""
+
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Tracks calls in flight by key.
+    The first caller for a key runs the function; callers arriving before it
+    finishes wait for and share its result, or its exception.
+
+    >>> SingleFlight().do("key", lambda x: x + 1, 1)
+    2
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = {}
+
+    def do(self, key, func, *args, **kwargs):
+        with self.lock:
+            future = self.in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self.in_flight[key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+        return result
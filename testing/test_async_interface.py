@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from testing.async_interface import AsyncClient
+
+
+def test_replay_bounds_requests_in_flight_and_keeps_request_order():
+    concurrency = 3
+    in_flight = {"now": 0, "max": 0}
+
+    async def handle(request):
+        payload = await request.json()
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        # later requests answer first, so completion order differs from request order
+        await asyncio.sleep(0.01 * (5 - payload["n"] % 5))
+        in_flight["now"] -= 1
+        return web.json_response({"n": payload["n"]})
+
+    async def replay_all():
+        app = web.Application()
+        app.router.add_post("/", handle)
+        async with TestServer(app) as server:
+            url = str(server.make_url("/"))
+            async with AsyncClient(concurrency=concurrency) as client:
+                return [
+                    resp
+                    async for resp in client.replay(
+                        lambda n: client.submit_payload(url, {"n": n}),
+                        ((n,) for n in range(20)),
+                    )
+                ]
+
+    responses = asyncio.run(replay_all())
+    assert responses == [{"n": n} for n in range(20)]
+    assert in_flight["max"] == concurrency
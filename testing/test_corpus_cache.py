@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+import json
+import os
+
+from testing.corpus_cache import CorpusCache
+from testing.parse_tests import load_tests
+
+
+def test_corpus_cache_reparses_only_changed_files(tmp_path):
+    os.makedirs(str(tmp_path / "external_json"))
+    external_json = tmp_path / "external_json" / "segments.json"
+    external_json.write_text(json.dumps({"segments": [1]}))
+    test_file = tmp_path / "corpus_tests.txt"
+    test_file.write_text(
+        "intent_whitelist: digit\n\n"
+        "test: one\ntranscript: one\nexternal_json: segments.json\ndigits: 1\n"
+    )
+    test_file = str(test_file)
+
+    cache = CorpusCache(str(tmp_path / "cache"))
+    assert cache.load(test_file) == load_tests(test_file)
+    cache.load(test_file)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert set(cache.loaded[test_file]["sources"]) == {
+        test_file,
+        os.path.abspath(str(external_json)),
+    }
+
+    # a new process reads the pickled corpus
+    cache = CorpusCache(str(tmp_path / "cache"))
+    cache.load(test_file)
+    assert (cache.hits, cache.misses) == (1, 0)
+
+    # touching a file without changing it keeps the entry
+    os.utime(str(external_json), ns=(1, 1))
+    cache.load(test_file)
+    assert (cache.hits, cache.misses) == (2, 0)
+
+    external_json.write_text(json.dumps({"segments": [2]}))
+    tests, _, _ = cache.load(test_file)
+    assert tests[0]["external_json"] == {"segments": [2]}
+    assert (cache.hits, cache.misses) == (2, 1)
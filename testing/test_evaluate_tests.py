@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+
+import random
+
+from testing.evaluate_tests import get_observed_values
+from testing.format_tests import strip_extra_whitespace
+
+
+def observed_by_concatenation(resp):
+    """
+    Observed nlprocessor entities built the way get_observed_values used to
+    """
+    observed_entity_dict = {}
+    for entity in resp.get("formatted_entities", []):
+        if entity.get("label", "") not in {"O", ""}:
+            label = entity["label"].replace("B-", "").replace("I-", "")
+            observed_entity_dict[label] = strip_extra_whitespace(
+                observed_entity_dict.get(label, "") + " " + entity.get("word")
+            )
+    return observed_entity_dict
+
+
+def test_observed_entities_match_concatenation():
+    rng = random.Random(0)
+    pieces = ["a", "bc", " ", "  ", "\t", "\n", "d e", "  f  "]
+    for _ in range(500):
+        resp = {
+            "formatted_entities": [
+                {
+                    "label": rng.choice(["O", "", "B-x", "I-x", "B-y", "I-y"]),
+                    "word": "".join(
+                        rng.choice(pieces) for _ in range(rng.randint(0, 4))
+                    ),
+                }
+                for _ in range(rng.randint(0, 8))
+            ]
+        }
+        observed_entity_dict, _ = get_observed_values(resp)
+        assert observed_entity_dict == observed_by_concatenation(resp)
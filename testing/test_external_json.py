@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+import gc
+import json
+import pickle
+
+from testing.expectations import compile_expectations
+from testing.external_json import ExternalJson, _documents
+
+
+def test_documents_are_shared_until_every_case_releases_them(tmp_path):
+    path = tmp_path / "segments.json"
+    path.write_text(json.dumps({"segments": [{"transcript": "one"}]}))
+    first, second = ExternalJson(str(path)), ExternalJson(str(path))
+    for reference in (first, first, second):
+        reference.acquire()
+
+    assert first["segments"] == second["segments"]
+    assert first.document is second.document
+
+    first.release()
+    second.release()
+    assert first._document is not None and second._document is None
+    first.release()
+    gc.collect()
+    assert first.path not in _documents
+
+    # released references reload on demand, and pickle as their path only
+    restored = pickle.loads(pickle.dumps(first))
+    assert restored == first == {"segments": [{"transcript": "one"}]}
+    assert len(pickle.dumps(first)) < 200 + len(first.path)
+
+
+def test_compiling_expectations_leaves_the_document_unloaded(tmp_path):
+    path = tmp_path / "segments.json"
+    path.write_text(json.dumps({"segments": [1]}))
+    reference = ExternalJson(str(path))
+
+    assert (
+        compile_expectations([("external_json", reference), ("digits", "1")])[0] is None
+    )
+    assert reference._document is None
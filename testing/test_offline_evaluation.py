@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+from testing.discovery_interface import make_discovery_payload
+from testing.offline_evaluation import (
+    evaluate_files,
+    response_finder,
+    summarize_results,
+)
+from testing.parse_tests import load_tests
+from testing.response_store import ResponseStore, load_responses
+
+
+def discovery_response(intent, **entities):
+    return {
+        "intents": [
+            {
+                "label": intent,
+                "entities": [
+                    {"label": label, "matches": [{"value": value}]}
+                    for label, value in entities.items()
+                ],
+            }
+        ]
+    }
+
+
+def test_recorded_responses_are_regraded_in_worker_processes(tmp_path):
+    test_file = tmp_path / "digit_tests.txt"
+    test_file.write_text(
+        "intent_whitelist: digit\n\n"
+        "test: one\ntranscript: one\ndigits: 1\n\n"
+        "test: two\ntranscript: two\ndigits: 2\nintent: digit\n\n"
+        "test: unrecorded\ntranscript: three\ndigits: 3\n"
+    )
+    test_file = str(test_file)
+    tests, intents, nlp_models = load_tests(test_file)
+
+    store = ResponseStore(str(tmp_path / "responses.jsonl"))
+    store.open()
+    submit = store.wrap(
+        "discovery",
+        lambda transcript, intents: discovery_response("digit", digits="1")
+        if transcript == "one"
+        else discovery_response("other", digits="2"),
+        make_discovery_payload,
+    )
+    for transcript in ("one", "two"):
+        submit(transcript, intents)
+    store.close()
+
+    find = response_finder(load_responses(store.path))
+    pairs = [
+        (test_dict, find(test_dict["transcript"], intents, nlp_models, {}))
+        for test_dict in tests
+    ]
+    assert pairs[-1][1] is None
+
+    for processes in (1, 2):
+        evaluated = evaluate_files({test_file: pairs}, processes, chunk_size=1)
+        output_dict = summarize_results(test_file, *evaluated[test_file])
+        assert (output_dict["correct_tests"], output_dict["total_tests"]) == (2, 4)
+        assert output_dict["entity_accuracy"] == 2 / 3
+        assert output_dict["expected_intents"] == ["digit"]
+        assert output_dict["observed_intents"] == ["other"]
+        assert [f[:2] for f in output_dict["test_failures"]] == [
+            ["two", "intent"],
+            ["unrecorded", "response"],
+        ]
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import os
+
+from testing.response_cache import DiskCache, MemoryCache, memoize
+
+
+def test_disk_cache_keys_on_versions_and_evicts(tmp_path):
+    calls = []
+
+    def submit(transcript, intents):
+        calls.append(transcript)
+        return {"transcript": transcript, "padding": "x" * 100}
+
+    def make_payload(transcript, intents):
+        return {"transcript": transcript, "intents": intents}
+
+    cache = DiskCache(str(tmp_path), max_bytes=300)
+    cached_submit = cache.wrap("discovery", submit, make_payload)
+
+    # a closed cache passes every call through
+    cached_submit("one", ["digit"])
+    assert calls == ["one"]
+
+    cache.open()
+    cached_submit("one", ["digit"])
+    cached_submit("one", ["digit"])
+    cached_submit("two", ["digit"])
+    assert calls == ["one", "one", "two"]
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    # a new interpreter invalidates discovery responses
+    cache.versions["discovery"]["interpreter"] = "changed"
+    cached_submit("one", ["digit"])
+    assert calls[-1] == "one"
+
+    # the third response outgrew the budget, so the least recently used one went
+    stored = [f for _, _, files in os.walk(str(tmp_path)) for f in files]
+    assert len(stored) == 2 and cache.bytes <= 300
+    cache.close()
+
+
+def test_disk_cache_skips_failed_responses(tmp_path):
+    calls = []
+
+    def submit(transcript):
+        calls.append(transcript)
+        return {"result": "failure"} if transcript == "bad" else {}
+
+    cache = DiskCache(str(tmp_path))
+    cached_submit = cache.wrap("nlprocessor", submit, lambda t: {"transcript": t})
+    cache.open()
+    for transcript in ["bad", "bad", "empty", "empty"]:
+        cached_submit(transcript)
+
+    assert calls == ["bad", "bad", "empty", "empty"]
+    assert not [f for _, _, files in os.walk(str(tmp_path)) for f in files]
+
+
+def test_memoize_within_memory_budget():
+    calls = []
+
+    def submit(transcript):
+        calls.append(transcript)
+        return {"transcript": transcript, "padding": "x" * 100}
+
+    cache = MemoryCache(max_bytes=300)
+    cached_submit = memoize(submit, cache)
+    for transcript in ["one", "two", "one", "three", "two"]:
+        cached_submit(transcript)
+
+    # only two responses fit, so "two" was evicted before it was asked for again
+    assert calls == ["one", "two", "three", "two"]
+    assert len(cache) == 2 and cache.bytes <= 300
+    assert cache.stats()["evictions"] == 2
+    assert (cache.hits, cache.misses) == (1, 4)
+
+
+def test_memoized_services_sharing_a_cache_keep_their_own_responses():
+    cache = MemoryCache()
+    discovery = memoize(
+        lambda transcript: {"discovery": transcript}, cache, "discovery"
+    )
+    nlprocessor = memoize(
+        lambda transcript: {"nlprocessor": transcript}, cache, "nlprocessor"
+    )
+
+    assert discovery("one") == {"discovery": "one"}
+    assert nlprocessor("one") == {"nlprocessor": "one"}
+    assert discovery("one") == {"discovery": "one"}
+    assert (cache.hits, cache.misses) == (1, 2)
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+
+import random
+
+from testing.schema_evaluation import _find, build_key_index
+
+KEYS = ["label", "value", "entities", "matches", "schema"]
+
+
+def random_json(rng, depth=0):
+    kind = rng.random()
+    if depth > 4 or kind < 0.3:
+        return rng.choice([None, "a", "b", 1, 2])
+    if kind < 0.6:
+        return [random_json(rng, depth + 1) for _ in range(rng.randint(0, 3))]
+    return {
+        rng.choice(KEYS): random_json(rng, depth + 1) for _ in range(rng.randint(0, 3))
+    }
+
+
+def test_key_index_matches_recursive_search():
+    rng = random.Random(0)
+    for _ in range(500):
+        resp = random_json(rng)
+        index = build_key_index(resp)
+        for key in KEYS:
+            assert index.get(key) == _find(resp, key)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pytest
+
+from testing import single_flight
+from testing.single_flight import SingleFlight
+
+
+def test_concurrent_identical_calls_share_one_request():
+    calls = []
+    flight = SingleFlight()
+
+    def submit(transcript):
+        calls.append(transcript)
+        time.sleep(0.1)
+        return {"transcript": transcript}
+
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        results = list(
+            executor.map(
+                lambda transcript: flight.do(transcript, submit, transcript),
+                ["a", "a", "a", "b", "b", "a"],
+            )
+        )
+
+    assert sorted(calls) == ["a", "b"]
+    assert [r["transcript"] for r in results] == ["a", "a", "a", "b", "b", "a"]
+    assert flight.in_flight == {}
+
+
+def test_waiters_share_the_exception(monkeypatch):
+    blocked = threading.Semaphore(0)
+
+    class SignallingFuture(Future):
+        """
+        Lets the test know when a waiter is blocked on the leader's result
+        """
+
+        def result(self, timeout=None):
+            blocked.release()
+            return super().result(timeout)
+
+    monkeypatch.setattr(single_flight, "Future", SignallingFuture)
+    calls = []
+    started, finish = threading.Event(), threading.Event()
+    flight = SingleFlight()
+
+    def submit(transcript):
+        calls.append(transcript)
+        started.set()
+        finish.wait()
+        raise ValueError(transcript)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        leader = executor.submit(flight.do, "a", submit, "a")
+        started.wait()
+        waiters = [executor.submit(flight.do, "a", submit, "a") for _ in range(3)]
+        try:
+            waited = [blocked.acquire(timeout=5) for _ in waiters]
+        finally:
+            finish.set()
+        errors = [future.exception(timeout=5) for future in [leader] + waiters]
+
+    assert all(waited)
+
+    assert calls == ["a"]
+    assert isinstance(errors[0], ValueError)
+    assert all(error is errors[0] for error in errors)